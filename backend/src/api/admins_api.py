@@ -8,10 +8,27 @@ import src.dependencies.auth_dependencies as auth_dependencies
 import src.dependencies.generally_dependencies as generally_dependencies
 import src.services.admins_services as admins_services
 import src.services.users_services as users_services
-from src.dto.chats_dto import ChatsAdminPaginatedDataclass, EventsPaginatedDataclass
+import src.utils.metrics_utils as metrics_utils
+import src.utils.workers_utils as workers_utils
+from src.dto.chats_dto import (
+    ChatsAdminPaginatedDataclass,
+    EventsPaginatedDataclass,
+    NNMetricsDataclass,
+    NNTimingsDataclass,
+    NNWorkerDataclass,
+)
 from src.dto.users_dto import UserDataclass
 from src.engines.database_engine import SessionDep
-from src.models.chats_models import ChatsAdminModel, EventCreateModel, EventModel, EventPaginatedModel
+from src.engines.redis_engine import RedisDep
+from src.models.chats_models import (
+    ChatsAdminModel,
+    EventCreateModel,
+    EventModel,
+    EventPaginatedModel,
+    NNMetricsModel,
+    NNTimingsModel,
+    NNWorkerModel,
+)
 from src.models.generally_models import PaginatedResponseModel, PaginationParamsModel, SystemRoleEnum
 from src.models.users_models import UserModel
 from src.schemas import EventSchema, UserSchema
@@ -37,6 +54,39 @@ async def chats_get_all(
     return chats
 
 
+@admins_router.get('/metrics', response_model=NNMetricsModel)
+async def metrics_get(
+    user: Annotated[UserDataclass, Depends(auth_dependencies.require_permission('admin'))],
+    redis: RedisDep,
+) -> NNMetricsDataclass:
+    """Get inference usage metrics."""
+    metrics = await metrics_utils.metrics_get(redis=redis)
+
+    return metrics
+
+
+@admins_router.get('/timings', response_model=NNTimingsModel)
+async def timings_get(
+    user: Annotated[UserDataclass, Depends(auth_dependencies.require_permission('admin'))],
+    redis: RedisDep,
+) -> NNTimingsDataclass:
+    """Get p50/p95/p99 of chat turn queue wait, service time and token counts."""
+    timings = await metrics_utils.metrics_timings_get(redis=redis)
+
+    return timings
+
+
+@admins_router.get('/workers', response_model=list[NNWorkerModel])
+async def workers_get(
+    user: Annotated[UserDataclass, Depends(auth_dependencies.require_permission('admin'))],
+    redis: RedisDep,
+) -> list[NNWorkerDataclass]:
+    """Get readiness and inference slots occupancy of the workers."""
+    workers = await workers_utils.workers_get(redis=redis)
+
+    return workers
+
+
 @admins_router.get('/events', response_model=EventPaginatedModel)
 async def event_get_all(
     request: Request,
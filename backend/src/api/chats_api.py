@@ -1,12 +1,14 @@
 from typing import Annotated
 
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 
 import src.controllers.chats_controllers as chats_controllers
 import src.dependencies.auth_dependencies as auth_dependencies
 import src.dependencies.chats_dependencies as chats_dependencies
 import src.utils.chats_utils as chats_utils
-from src.dto.chats_dto import ChatDataclass
+import src.utils.workers_utils as workers_utils
+from src.dto.chats_dto import ChatDataclass, NNQueueJobDataclass
 from src.dto.users_dto import UserDataclass
 from src.engines.database_engine import SessionDep
 from src.engines.redis_engine import RedisDep
@@ -17,6 +19,7 @@ from src.models.chats_models import (
     ChatUserModel,
     MessageCreateModel,
 )
+from src.models.generally_models import NNJobEnum
 from src.schemas import ChatSchema
 
 chats_router = APIRouter(
@@ -36,15 +39,14 @@ async def chats_get_all(
     return chats
 
 
-@chats_router.post('/', response_model=ChatCreateModel)
+@chats_router.post('/', response_model=ChatCreateModel, dependencies=[Depends(chats_dependencies.require_admission)])
 async def chat_create(
     user: Annotated[UserDataclass, Depends(auth_dependencies.require_permission('anonym'))],
     db: SessionDep,
     redis: RedisDep,
     create_chat_data: ChatCreateModel,
-    background_tasks: BackgroundTasks,
 ) -> ChatDataclass:
-    """Create a new GPT chat."""
+    """Create a new GPT chat and queue its initialization."""
     if user.role == 'anonym' and await chats_utils.queue_get_count_tasks(redis=redis, user_id=user.id) >= 1:
         raise Logger.create_response_error(error_key='access_denied', is_cookie_remove=False)
 
@@ -52,14 +54,18 @@ async def chat_create(
         db=db, redis=redis, create_chat_data=create_chat_data, user_id=user.id, user_role=user.role
     )
 
-    queue_position = await chats_utils.queue_add_task(redis=redis, chat_id=chat.id, user_id=user.id)
-    chat.queue_position = queue_position
-
-    background_tasks.add_task(
-        chats_controllers.chat_init, create_chat_data=create_chat_data, db=db, redis=redis, chat=chat
+    chat.queue_position = await chats_utils.queue_add_task(
+        redis=redis,
+        job=NNQueueJobDataclass(
+            kind=NNJobEnum.CHAT_INIT,
+            chat_id=chat.id,
+            user_id=user.id,
+            role=user.role,
+            count_tokens=0,
+            data=create_chat_data.model_dump(mode='json'),
+        ),
     )
-
-    await chats_utils.chat_save(chat=chat, redis=redis)
+    chat.eta = await workers_utils.workers_eta_estimate(redis=redis, queue_position=chat.queue_position)
     return chat
 
 
@@ -76,27 +82,31 @@ async def chat_delete(
     return chat
 
 
-@chats_router.put('/{chat_id}/messages', response_model=ChatUserModel)
+@chats_router.put(
+    '/{chat_id}/messages', response_model=ChatUserModel, dependencies=[Depends(chats_dependencies.require_admission)]
+)
 async def message_create(
     create_message_data: MessageCreateModel,
     redis: RedisDep,
-    db: SessionDep,
     chat: Annotated[ChatDataclass, Depends(chats_dependencies.get_chat)],
     user: Annotated[UserDataclass, Depends(auth_dependencies.require_permission('anonym'))],
-    background_tasks: BackgroundTasks,
 ) -> ChatDataclass:
-    """Create and send message to GPT chat."""
+    """Create message and queue sending it to GPT chat."""
     if user.role == 'anonym' and await chats_utils.queue_get_count_tasks(redis=redis, user_id=user.id) >= 1:
         raise Logger.create_response_error(error_key='access_denied', is_cookie_remove=False)
 
-    queue_position = await chats_utils.queue_add_task(redis=redis, chat_id=chat.id, user_id=chat.user_id)
-    chat.queue_position = queue_position
-
-    background_tasks.add_task(
-        chats_controllers.message_send, chat=chat, create_message_data=create_message_data, db=db, redis=redis
+    chat.queue_position = await chats_utils.queue_add_task(
+        redis=redis,
+        job=NNQueueJobDataclass(
+            kind=NNJobEnum.MESSAGE_SEND,
+            chat_id=chat.id,
+            user_id=chat.user_id,
+            role=user.role,
+            count_tokens=chat.current_count_request_tokens,
+            data=create_message_data.model_dump(mode='json'),
+        ),
     )
-
-    await chats_utils.chat_save(chat=chat, redis=redis)
+    chat.eta = await workers_utils.workers_eta_estimate(redis=redis, queue_position=chat.queue_position)
     return chat
 
 
@@ -104,3 +114,29 @@ async def message_create(
 async def chat_get(chat: Annotated[ChatDataclass, Depends(chats_dependencies.get_chat)]) -> ChatDataclass:
     """Get GPT chat by ID."""
     return chat
+
+
+@chats_router.get('/{chat_id}/stream')
+async def chat_stream(
+    chat: Annotated[ChatDataclass, Depends(chats_dependencies.get_chat_metadata)],
+    redis: RedisDep,
+) -> StreamingResponse:
+    """Stream GPT chat response tokens as Server-Sent Events."""
+    return StreamingResponse(
+        chats_utils.chat_stream_listen(redis=redis, chat=chat),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@chats_router.get('/{chat_id}/events')
+async def chat_events(
+    chat: Annotated[ChatDataclass, Depends(chats_dependencies.get_chat_metadata)],
+    redis: RedisDep,
+) -> StreamingResponse:
+    """Push GPT chat queue position changes and generation events as Server-Sent Events."""
+    return StreamingResponse(
+        chats_utils.chat_events_listen(redis=redis, chat=chat),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+
+import src.utils.workers_utils as workers_utils
+from src.engines.redis_engine import RedisDep
+from src.logger import Logger
+from src.models.generally_models import ResponseModel
+
+health_router = APIRouter(
+    prefix='/health',
+    tags=['health'],
+)
+
+
+@health_router.get('/ready', response_model=ResponseModel)
+async def ready(redis: RedisDep) -> ResponseModel:
+    """Report readiness once a worker has the models loaded on its inference nodes."""
+    workers = await workers_utils.workers_get(redis=redis)
+    if not any(worker.is_ready for worker in workers):
+        raise Logger.create_response_error(error_key='service_unavailable')
+
+    return ResponseModel(message='ready')
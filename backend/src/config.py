@@ -1,10 +1,19 @@
-from typing import Optional
+from typing import Any, Optional
 
 from fastapi_mail import ConnectionConfig
-from pydantic import SecretStr
+from pydantic import BaseModel, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class InferenceTier(BaseModel):
+    """Degraded inference tier entered when the estimated queue wait exceeds its threshold."""
+
+    wait: float
+    model: Optional[str] = None
+    num_ctx: Optional[int] = None
+    num_predict: Optional[int] = None
+
+
 class Settings(BaseSettings):
     """Application configuration settings loaded from environment variables or a .env file."""
 
@@ -17,6 +26,19 @@ class Settings(BaseSettings):
     redis_chat_time_live: int = 3600
     redis_chat_time_notification: int = 3500
     redis_token_time_live: int = 2_592_000
+    greeting_pool_size: int = 3
+    greeting_pool_personas: int = 20
+    greeting_pool_interval: float = 5.0
+    greeting_pool_time_live: int = 86_400
+
+    chat_num_predict_detail: list[int] = [96, 128, 192, 256, 384]
+    chat_num_predict_pacing: list[float] = [1.25, 1.1, 1.0, 0.85, 0.7]
+
+    chat_stream_heartbeat: float = 15.0
+    chat_context_budget: int = 8192
+    chat_context_keep_turns: int = 4
+    vacancy_cache_time_live: int = 604_800
+    vacancy_cache_max_size: int = 1000
 
     backend_cors_origins: Optional[str] = None
 
@@ -25,10 +47,65 @@ class Settings(BaseSettings):
     jwt_algorithm: str
 
     gpt_api_key: SecretStr
+    openai_base_url: Optional[str] = None
+    openai_model: str = 'gpt-4o-mini'
+    openai_task_models: dict[str, str] = {}
+    openai_timeout: float = 120.0
 
     ollama_host: str
     ollama_port: int
     ollama_model: str
+    ollama_nodes: list[str] = []
+    ollama_health_check_interval: float = 15.0
+    ollama_health_check_timeout: float = 5.0
+    ollama_sticky_max_skew: int = 1
+    ollama_sticky_max_chats: int = 10_000
+    ollama_num_ctx_buckets: list[int] = [4096, 8192, 16384, 32768, 65536]
+    ollama_num_ctx_headroom: int = 1024
+    ollama_chars_per_token: float = 3.0
+    ollama_keep_alive: str = '30m'
+    ollama_num_parallel: int = 1
+    ollama_task_models: dict[str, str] = {}
+    ollama_task_options: dict[str, dict[str, Any]] = {
+        'interview': {'stop': ['\nКандидат:', '\nCandidate:', '\nuser:']},
+        'validation': {'temperature': 0, 'num_predict': 32},
+        'conversion': {'temperature': 0},
+    }
+    ollama_warmup_interval: float = 600.0
+    ollama_request_deadline: float = 600.0
+    ollama_max_retries: int = 1
+    ollama_breaker_failures: int = 3
+    ollama_breaker_cooldown: float = 30.0
+    ollama_hedge_percentile: Optional[float] = None
+    ollama_hedge_min_samples: int = 20
+    ollama_hedge_window: int = 200
+    ollama_busy_hours: list[int] = []
+
+    inference_slots: Optional[int] = None
+    inference_overflow_wait: Optional[float] = None
+    inference_service_time: float = 30.0
+    inference_tiers: list[InferenceTier] = []
+    inference_tier_exit_ratio: float = 0.5
+    inference_service_time_smoothing: float = 0.2
+
+    queue_poll_interval: float = 0.5
+    queue_lease_time: int = 60
+    queue_turn_cost: float = 10.0
+    queue_token_cost: float = 0.002
+    queue_role_weights: dict[str, float] = {'admin': 4.0, 'user': 2.0, 'anonym': 1.0}
+    queue_max_delay: float = 300.0
+    queue_admission_max_waits: dict[str, float] = {'user': 1800.0, 'anonym': 600.0}
+    worker_heartbeat_interval: int = 5
+
+    metrics_histogram_window: int = 3600
+    metrics_histogram_slice: int = 60
+    ollama_connect_timeout: float = 10.0
+    ollama_read_timeout: float = 120.0
+    ollama_first_chunk_timeout: float = 600.0
+    ollama_pool_timeout: Optional[float] = None
+    ollama_max_connections: int = 16
+    ollama_max_keepalive_connections: int = 8
+    ollama_keepalive_expiry: float = 300.0
 
     host: str
     port: int
@@ -55,9 +132,21 @@ class Settings(BaseSettings):
         )
 
     @property
-    def ollama_url(self) -> str:
-        """Construct the full Ollama URL."""
-        return f'http://{self.ollama_host}:{self.ollama_port}/api/chat'
+    def ollama_urls(self) -> list[str]:
+        """Construct base URLs of all Ollama nodes, falling back to the single configured host."""
+        nodes = self.ollama_nodes or [f'{self.ollama_host}:{self.ollama_port}']
+        return [node if node.startswith('http') else f'http://{node}' for node in nodes]
+
+    @property
+    def ollama_models(self) -> list[str]:
+        """Get all Ollama models used by the application."""
+        tier_models = [tier.model for tier in self.inference_tiers if tier.model]
+        return list(dict.fromkeys([self.ollama_model, *self.ollama_task_models.values(), *tier_models]))
+
+    @property
+    def inference_concurrency(self) -> int:
+        """Get the number of inference jobs run at once, by default the parallel slots of all Ollama nodes."""
+        return self.inference_slots or self.ollama_num_parallel * len(self.ollama_urls)
 
     @property
     def database_url(self) -> str:
@@ -1,25 +1,35 @@
+import asyncio
+from contextlib import nullcontext
+from dataclasses import asdict
 from datetime import datetime
-from json import loads
+from functools import partial
+from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-import src.engines.ollama_engine as ollama_engine
+import src.engines.inference_engine as inference_engine
 import src.services.chats_services as gpt_service
 import src.utils.chats_utils as chats_utils
+import src.utils.greetings_utils as greetings_utils
+import src.utils.metrics_utils as metrics_utils
 import src.utils.redis_utils as redis_utils
-from src.config import NNConfig
+from src.config import settings
 from src.dto.chats_dto import (
     ChatDataclass,
     ChatsAdminPaginatedDataclass,
     EventDataclass,
     EventsPaginatedDataclass,
     MessageDataclass,
+    NNQueueJobDataclass,
 )
+from src.engines.database_engine import session_factory
 from src.engines.redis_engine import AsyncRedis
 from src.logger import Logger
 from src.models.chats_models import ChatCreateModel, EventCreateModel, MessageCreateModel
-from src.models.generally_models import NNRoleEnum, SystemRoleEnum
-from src.schemas import ChatSchema, EventSchema
+from src.models.generally_models import NNJobEnum, NNRoleEnum, SystemRoleEnum
+from src.schemas import ChatSchema, EventSchema, MessageSchema
+
+chat_summary_tasks: dict[int, asyncio.Task[None]] = {}
 
 
 async def chats_user_get_all(db: AsyncSession, user_id: int) -> list[ChatSchema]:
@@ -60,6 +70,7 @@ async def chat_create(
         progression_type=create_chat_data.progression_type,
         title=create_chat_data.title,
         user_id=user_id,
+        num_predict=chats_utils.chat_num_predict(create_chat_data=create_chat_data),
     )
 
     chat_dataclass = ChatDataclass.from_orm(chat)
@@ -69,98 +80,134 @@ async def chat_create(
     return chat_dataclass
 
 
-async def chat_init(create_chat_data: ChatCreateModel, db: AsyncSession, redis: AsyncRedis, chat: ChatDataclass):
-    """Initialize GPT chat."""
-    if create_chat_data.initial_context:
-        initial_context = await chats_utils.ollama_generate_initial_context(create_chat_data.initial_context)
-    else:
-        initial_context = ''
-
-    events = await chats_utils.event_get_random(db=db)
-    system_prompt_content = (
-        f'Ты — живой интервьюер с уникальной личностью, проводящий собеседование на позицию '
-        f'{NNConfig["language"][create_chat_data.language]} разработчика.'
-        'Критически важно соблюдать естественный диалоговый ритм:\n\n'
-        'ЖЕСТКИЕ ПРАВИЛА ДИАЛОГА:\n'
-        '1. Первое сообщение: ТОЛЬКО приветствие и представление (1-2 предложения)\n'
-        "   Пример: 'Привет! Я Алексей, senior-разработчик. Рад видеть тебя на собеседовании.'\n"
-        '2. После приветствия ОБЯЗАТЕЛЬНО ДОЖДИСЬ ответа кандидата\n'
-        '3. Только после ответа задай ПЕРВЫЙ вопрос\n'
-        '4. Всегда задавай строго по одному вопросу за реплику\n'
-        '5. Между вопросами ВСЕГДА жди ответа пользователя\n'
-        '6. Реплики должны быть краткими (1-2 предложения максимум)\n\n'
-        'ТЕХНИКИ ЕСТЕСТВЕННОГО ПОВЕДЕНИЯ:\n'
-        '- После ответа кандидата делай микропаузу (0.5-2 сек)\n'
-        "- Используй подтверждающие реплики ('Понял', 'Интересно', 'Ясно')\n"
-        '- Задавай уточняющие вопросы по ответам\n'
-        "- Проявляй эмоциональные реакции ('О, необычный подход!', 'Вот это интересно!')\n"
-        "- Допускай естественные паузы обдумывания (используй фразы типа '{random.choice(SPONTANEITY_CONFIG['thinking_phrases'])}')\n"
-        "- В 10% случаев добавляй личные комментарии: '{random.choice(SPONTANEITY_CONFIG['personal_comments'])}'\n"
-        "- В 15% вопросов используй спонтанные уточнения: '{random.choice(SPONTANEITY_CONFIG['follow_up_questions'])}'\n"
-        "- В 5% случаев допускай вежливые прерывания: '{random.choice(SPONTANEITY_CONFIG['natural_interruptions'])}'\n\n"
-        'СТРУКТУРА СОБЕСЕДОВАНИЯ:\n'
-        '1. Приветствие (только в первом сообщении)\n'
-        '2. Легкий разогревочный вопрос\n'
-        '3. Технические вопросы по вакансии\n'
-        '4. Поведенческие вопросы\n'
-        '5. Вопросы кандидату\n\n'
-        'ПАРАМЕТРЫ СТИЛЯ:\n'
-        f'• Сложность: {NNConfig["difficulty"][create_chat_data.difficulty]}\n'
-        f'• Вежливость: {NNConfig["politeness"][create_chat_data.politeness]}\n'
-        f'• Дружелюбие: {NNConfig["friendliness"][create_chat_data.friendliness]}\n'
-        f'• Жёсткость: {NNConfig["rigidity"][create_chat_data.rigidity]}\n'
-        f'• Детализация: {NNConfig["detail_orientation"][create_chat_data.detail_orientation]}\n'
-        f'• Темп: {NNConfig["pacing"][create_chat_data.pacing]}\n'
-        'ДОПОЛНИТЕЛЬНЫЕ СОБЫТИЯ:\n' + '\n'.join(f'- {event.content}' for event in events) + '\n\n'
-        'ЗАПРЕЩЕНО:\n'
-        '- Задавать несколько вопросов подряд\n'
-        '- Продолжать без ответа пользователя\n'
-        '- Делать длинные монологи\n'
-        '- Использовать шаблонные фразы\n'
-        f'КОНТЕКСТ ВАКАНСИИ:\n{initial_context}\n\n'
-    )
+async def chat_init(
+    create_chat_data: ChatCreateModel,
+    db: AsyncSession,
+    redis: AsyncRedis,
+    chat: ChatDataclass,
+    enqueued_at: Optional[float] = None,
+):
+    """Initialize GPT chat on an inference slot, measuring the turn once the slot is acquired.
+
+    Independent steps run concurrently: the vacancy processing with the event selection,
+    then the first model turn with persisting the prompts and events.
+    The first turn is only a greeting, so a pre-generated one is taken from the pool when available
+    and the chat then needs no inference slot at all unless a vacancy has to be processed.
+    """
+    greeting = await greetings_utils.greeting_pool_take(redis=redis, create_chat_data=create_chat_data)
+    is_inference = not greeting or bool(create_chat_data.initial_context)
+    slot = inference_engine.get_inference_scheduler().slot_acquire(chat_id=chat.id) if is_inference else nullcontext()
+
+    async with (
+        slot,
+        metrics_utils.metrics_turn_measure(redis=redis, enqueued_at=enqueued_at, is_inference=is_inference) as turn,
+    ):
+        initial_context_task = None
+        if create_chat_data.initial_context:
+            initial_context_task = asyncio.create_task(
+                chats_utils.ollama_generate_initial_context(
+                    message=create_chat_data.initial_context, chat_id=chat.id, redis=redis
+                )
+            )
 
-    system_prompt = await gpt_service.message_create(
-        db=db, chat_id=chat.id, role=NNRoleEnum.SYSTEM, content=system_prompt_content
-    )
-    chat.messages.append(MessageDataclass.from_orm(system_prompt))
-    nn_response = await ollama_engine.ollama_request(messages=chat.messages)
-
-    chat.total_count_request_tokens += nn_response.count_request_tokens
-    chat.total_count_response_tokens += nn_response.count_response_tokens
-    chat.current_count_request_tokens = nn_response.count_request_tokens + nn_response.count_response_tokens
-    chat.messages.append(
-        MessageDataclass(
-            id=None,
-            chat_id=chat.id,
-            role=NNRoleEnum.ASSISTANT,
-            content=nn_response.content,
-            created_at=datetime.now().isoformat(),
+        try:
+            events = await chats_utils.event_get_random(db=db)
+            initial_context = await initial_context_task if initial_context_task else ''
+        finally:
+            if initial_context_task:
+                initial_context_task.cancel()
+
+        prompt_contents = [chats_utils.system_prompt_build(create_chat_data=create_chat_data)]
+        context_prompt_content = chats_utils.context_prompt_build(initial_context=initial_context, events=events)
+        if context_prompt_content:
+            prompt_contents.append(context_prompt_content)
+
+        prompts_start = len(chat.messages)
+        chat.messages.extend(
+            MessageDataclass(
+                id=None,
+                chat_id=chat.id,
+                role=NNRoleEnum.SYSTEM,
+                content=content,
+                created_at=datetime.now().isoformat(),
+            )
+            for content in prompt_contents
         )
-    )
 
-    await gpt_service.chat_edit(db=db, chat_id=chat.id, events=events)
-    await chats_utils.chat_save(chat=chat, redis=redis)
+        async def prompts_persist() -> list[MessageSchema]:
+            prompts = [
+                await gpt_service.message_create(db=db, chat_id=chat.id, role=NNRoleEnum.SYSTEM, content=content)
+                for content in prompt_contents
+            ]
+            await gpt_service.chat_edit(db=db, chat_id=chat.id, events=events)
+            return prompts
+
+        if greeting:
+            nn_response = greeting.model_copy(
+                update={
+                    'count_request_tokens': chats_utils.chat_tokens_count(chat=chat),
+                    'count_prompt_eval_tokens': 0,
+                }
+            )
+            prompts = await prompts_persist()
+        else:
+            nn_response, prompts = await asyncio.gather(
+                inference_engine.inference_request(
+                    messages=chat.messages,
+                    chat_id=chat.id,
+                    count_tokens=chats_utils.chat_tokens_count(chat=chat),
+                    on_chunk=chats_utils.chat_stream_publisher(redis=redis, chat_id=chat.id),
+                    num_predict=chat.num_predict,
+                ),
+                prompts_persist(),
+            )
+            await metrics_utils.metrics_nn_response_record(redis=redis, nn_response=nn_response)
 
-    await chats_utils.queue_remove_task(redis=redis)
-    chat.queue_position = 0
+        chat.messages[prompts_start : prompts_start + len(prompts)] = [
+            MessageDataclass.from_orm(prompt) for prompt in prompts
+        ]
 
-    return chat
+        turn.prompt_tokens = nn_response.count_request_tokens
+        turn.response_tokens = nn_response.count_response_tokens
+        chat.total_count_request_tokens += nn_response.count_request_tokens
+        chat.total_count_response_tokens += nn_response.count_response_tokens
+        chat.current_count_request_tokens = nn_response.count_request_tokens + nn_response.count_response_tokens
+        chat.messages.append(
+            MessageDataclass(
+                id=None,
+                chat_id=chat.id,
+                role=NNRoleEnum.ASSISTANT,
+                content=nn_response.content,
+                created_at=datetime.now().isoformat(),
+                tier=nn_response.tier,
+            )
+        )
+
+        chat.queue_position = 0
+
+        if not await chats_utils.chat_save(chat=chat, redis=redis, is_queued=True):
+            return chat
+
+        await chats_utils.queue_remove_task(redis=redis, chat_id=chat.id)
+        await chats_utils.chat_stream_publish(
+            redis=redis, chat_id=chat.id, event='done', data=asdict(chat.messages[-1])
+        )
+
+        return chat
 
 
 async def chat_delete(chat_id: int, user_id: int, db: AsyncSession, redis: AsyncRedis) -> ChatDataclass:
-    """Delete GPT chat by ID (soft delete)."""
+    """Delete GPT chat by ID (soft delete), cancelling its queued or running generation."""
+    await chats_utils.queue_remove_task(redis=redis, chat_id=chat_id)
+    await chats_utils.chat_job_cancel(redis=redis, chat_id=chat_id)
+
     chat = await gpt_service.chat_edit(db=db, is_archived=True, chat_id=chat_id)
 
-    redis_chat = await redis.get(f'{user_id}/chat:{chat_id}')
+    redis_chat = await chats_utils.chat_load_redis(redis=redis, user_id=user_id, chat_id=chat_id)
     if redis_chat:
-        chat_dict = loads(redis_chat)
-        chat_dataclass = ChatDataclass.from_dict(chat_dict)
-
-        chat = await redis_utils.save_messages(chat=chat_dataclass, db=db)
+        chat = await redis_utils.save_messages(chat=redis_chat, db=db)
 
-        await redis.delete(f'notifications/delete={user_id}/chat:{chat_id}')
-        await redis.delete(f'{user_id}/chat:{chat_id}')
+        await chats_utils.chat_delete_redis(redis=redis, user_id=user_id, chat_id=chat_id)
     else:
         chat = ChatDataclass.from_orm(chat)
 
@@ -168,57 +215,180 @@ async def chat_delete(chat_id: int, user_id: int, db: AsyncSession, redis: Async
 
 
 async def message_send(
-    chat: ChatDataclass, create_message_data: MessageCreateModel, redis: AsyncRedis, db: AsyncSession
+    chat: ChatDataclass,
+    create_message_data: MessageCreateModel,
+    redis: AsyncRedis,
+    db: AsyncSession,
+    enqueued_at: Optional[float] = None,
 ) -> ChatDataclass:
-    """Create and send message to GPT chat."""
-    chat.messages.append(
-        MessageDataclass(
-            id=None,
-            chat_id=chat.id,
-            role=create_message_data.role,
-            content=create_message_data.content,
-            created_at=datetime.now().isoformat(),
-        )
-    )
-
-    random_event, new_percent = await chats_utils.event_get_one(db=db, chat=chat)
-    if random_event:
-        chat.events.append(EventDataclass.from_orm(random_event))
+    """Create and send message to GPT chat on an inference slot, measuring the turn once the slot is acquired.
+
+    The summary is updated after the slot is released, in a background task on a slot of its own.
+    """
+    async with (
+        inference_engine.get_inference_scheduler().slot_acquire(chat_id=chat.id),
+        metrics_utils.metrics_turn_measure(redis=redis, enqueued_at=enqueued_at) as turn,
+    ):
+        chat = await chats_utils.chat_summary_get(chat=chat, redis=redis)
         chat.messages.append(
             MessageDataclass(
                 id=None,
                 chat_id=chat.id,
-                role=NNRoleEnum.SYSTEM,
-                content='Событие добавлено: ' + random_event.content,
+                role=create_message_data.role,
+                content=create_message_data.content,
                 created_at=datetime.now().isoformat(),
             )
         )
 
-    chat.current_event_chance = new_percent
+        random_event, new_percent = await chats_utils.event_get_one(db=db, chat=chat)
+        if random_event:
+            chat.events.append(EventDataclass.from_orm(random_event))
+            chat.messages.append(
+                MessageDataclass(
+                    id=None,
+                    chat_id=chat.id,
+                    role=NNRoleEnum.SYSTEM,
+                    content='Событие добавлено: ' + random_event.content,
+                    created_at=datetime.now().isoformat(),
+                )
+            )
 
-    nn_response = await ollama_engine.ollama_request(messages=chat.messages)
-    await chats_utils.queue_remove_task(redis=redis)
+        chat.current_event_chance = new_percent
 
-    chat.queue_position = 0
-    chat.total_count_request_tokens += nn_response.count_request_tokens
-    chat.total_count_response_tokens += nn_response.count_response_tokens
-    chat.current_count_request_tokens = nn_response.count_request_tokens + nn_response.count_response_tokens
-    chat.messages.append(
-        MessageDataclass(
-            id=None,
+        nn_response = await inference_engine.inference_request(
+            messages=chats_utils.chat_context_build(chat=chat),
             chat_id=chat.id,
-            role=NNRoleEnum.ASSISTANT,
-            content=nn_response.content,
-            created_at=datetime.now().isoformat(),
+            count_tokens=chats_utils.chat_tokens_count(chat=chat),
+            on_chunk=chats_utils.chat_stream_publisher(redis=redis, chat_id=chat.id),
+            num_predict=chat.num_predict,
         )
-    )
+        await metrics_utils.metrics_nn_response_record(redis=redis, nn_response=nn_response)
+
+        chat.queue_position = 0
+        turn.prompt_tokens = nn_response.count_request_tokens
+        turn.response_tokens = nn_response.count_response_tokens
+        chat.total_count_request_tokens += nn_response.count_request_tokens
+        chat.total_count_response_tokens += nn_response.count_response_tokens
+        chat.current_count_request_tokens = nn_response.count_request_tokens + nn_response.count_response_tokens
+        chat.messages.append(
+            MessageDataclass(
+                id=None,
+                chat_id=chat.id,
+                role=NNRoleEnum.ASSISTANT,
+                content=nn_response.content,
+                created_at=datetime.now().isoformat(),
+                tier=nn_response.tier,
+            )
+        )
+
+        if not await chats_utils.chat_save(chat=chat, redis=redis, is_queued=True):
+            return chat
+
+        await chats_utils.queue_remove_task(redis=redis, chat_id=chat.id)
+        await chats_utils.chat_stream_publish(
+            redis=redis, chat_id=chat.id, event='done', data=asdict(chat.messages[-1])
+        )
+        chat.updated_at = datetime.now().isoformat()
 
-    await chats_utils.chat_save(chat=chat, redis=redis)
-    chat.updated_at = datetime.now().isoformat()
+    chat_summary_schedule(redis=redis, chat=chat)
 
     return chat
 
 
+def chat_summary_schedule(redis: AsyncRedis, chat: ChatDataclass) -> None:
+    """Update the chat summary in a background task of its own, at most one per chat.
+
+    The task is not a chat job, so the next turn of the chat neither cancels it nor is dequeued by its failure.
+    """
+    summary_task = chat_summary_tasks.get(chat.id)
+    if summary_task is not None and not summary_task.done():
+        return
+
+    chat_summary_tasks[chat.id] = asyncio.create_task(chat_summary_run(redis=redis, chat=chat))
+
+
+async def chat_summary_run(redis: AsyncRedis, chat: ChatDataclass) -> None:
+    """Update the chat summary with its own database session."""
+    try:
+        async with session_factory() as db:
+            await chats_utils.chat_summary_update(chat=chat, redis=redis, db=db)
+    except Exception as e:
+        print(f'Error updating chat summary: {e}')
+    finally:
+        if chat_summary_tasks.get(chat.id) is asyncio.current_task():
+            del chat_summary_tasks[chat.id]
+
+
+async def chat_job_run(redis: AsyncRedis, job: NNQueueJobDataclass) -> None:
+    """Run the queued chat job with its own database session.
+
+    The job is registered before its task is checked to be still queued, so a chat deleted meanwhile is either
+    skipped here or reached by the cancellation.
+    """
+
+    async def run() -> None:
+        if not await chats_utils.queue_has_task(redis=redis, chat_id=job.chat_id):
+            return
+
+        async with session_factory() as db:
+            chat = await chats_utils.chat_load(db=db, redis=redis, user_id=job.user_id, chat_id=job.chat_id)
+            if not chat:
+                await chats_utils.queue_remove_task(redis=redis, chat_id=job.chat_id)
+                return
+
+            if job.kind == NNJobEnum.CHAT_INIT:
+                await chat_init(
+                    create_chat_data=ChatCreateModel.model_validate(job.data),
+                    db=db,
+                    redis=redis,
+                    chat=chat,
+                    enqueued_at=job.enqueued_at,
+                )
+            else:
+                await message_send(
+                    chat=chat,
+                    create_message_data=MessageCreateModel.model_validate(job.data),
+                    db=db,
+                    redis=redis,
+                    enqueued_at=job.enqueued_at,
+                )
+
+    await inference_engine.get_inference_scheduler().job_run(
+        chat_id=job.chat_id,
+        job=run,
+        on_failure=partial(chats_utils.chat_job_fail, redis=redis, chat_id=job.chat_id),
+    )
+
+
+async def chat_queue_consume_loop(redis: AsyncRedis) -> None:
+    """Claim queued chat jobs while the inference scheduler has free slots or overflows, and run them.
+
+    Leases of running jobs are renewed on every poll, so jobs of a stopped consumer are claimed again
+    once their leases expire.
+    """
+    scheduler = inference_engine.get_inference_scheduler()
+    running: dict[int, asyncio.Task[None]] = {}
+
+    try:
+        while True:
+            running = {chat_id: task for chat_id, task in running.items() if not task.done()}
+            await chats_utils.queue_lease_renew(redis=redis, chat_ids=list(running))
+            scheduler.backlog = await chats_utils.queue_get_backlog(redis=redis)
+
+            while len(running) < scheduler.concurrency or scheduler.is_overflowing():
+                job = await chats_utils.queue_claim_task(redis=redis)
+                if not job:
+                    break
+
+                scheduler.backlog = max(0, scheduler.backlog - 1)
+                running[job.chat_id] = asyncio.create_task(chat_job_run(redis=redis, job=job))
+
+            await asyncio.sleep(settings.queue_poll_interval)
+    finally:
+        for task in running.values():
+            task.cancel()
+
+
 async def event_create(event_create_data: EventCreateModel, db: AsyncSession) -> EventSchema:
     """Create a new event."""
     new_event = await gpt_service.event_create(db=db, content=event_create_data.content)
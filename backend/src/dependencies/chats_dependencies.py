@@ -1,8 +1,5 @@
-from json import loads
-
 from fastapi import Request
 
-import src.services.chats_services as gpt_service
 import src.utils.chats_utils as chats_utils
 from src.dto.chats_dto import ChatDataclass
 from src.engines.database_engine import SessionDep
@@ -18,20 +15,28 @@ async def get_chat(
 ) -> ChatDataclass:
     """Get GPT chat by ID."""
     user = request.state.user
-    user_id = user.id
-    redis_chat = await redis.get(value=f'{user_id}/chat:{chat_id}')
-    if redis_chat:
-        chat = loads(redis_chat)
-        return ChatDataclass.from_dict(chat)
+    chat = await chats_utils.chat_load(db=db, redis=redis, user_id=user.id, chat_id=chat_id)
+    if not chat:
+        raise Logger.create_response_error(error_key='data_not_found')
 
-    chat = await gpt_service.chat_get(db=db, user_id=user_id, chat_id=chat_id)
+    return chat
+
+
+async def get_chat_metadata(
+    request: Request,
+    chat_id: int,
+    db: SessionDep,
+    redis: RedisDep,
+) -> ChatDataclass:
+    """Get GPT chat by ID without reading its messages from Redis."""
+    user = request.state.user
+    chat = await chats_utils.chat_load(db=db, redis=redis, user_id=user.id, chat_id=chat_id, is_messages=False)
     if not chat:
         raise Logger.create_response_error(error_key='data_not_found')
 
-    chat_dataclass = ChatDataclass.from_orm(chat)
-    queue_position = await chats_utils.queue_get_position(redis=redis, chat_id=chat_id)
-    chat_dataclass.queue_position = queue_position
+    return chat
 
-    await chats_utils.chat_save(chat=chat_dataclass, redis=redis)
 
-    return chat_dataclass
+async def require_admission(request: Request, redis: RedisDep) -> None:
+    """Refuse a new turn of the user while the queue is overloaded, before anything is written."""
+    await chats_utils.queue_admit(redis=redis, role=request.state.user.role)
@@ -1,8 +1,8 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Optional
 
 from src.dto.generally_dto import BaseDataclass, PaginatedDataclass
-from src.models.generally_models import NNRoleEnum
+from src.models.generally_models import NNJobEnum, NNRoleEnum, SystemRoleEnum
 
 
 @dataclass
@@ -22,6 +22,7 @@ class MessageDataclass(BaseDataclass):
     role: NNRoleEnum
     content: str
     created_at: str
+    tier: Optional[int] = None
 
 
 @dataclass
@@ -42,6 +43,10 @@ class ChatDataclass(BaseDataclass):
     created_at: str
     updated_at: str
     queue_position: Optional[int] = 0
+    summary: Optional[str] = None
+    summary_message_count: Optional[int] = 0
+    num_predict: Optional[int] = None
+    eta: Optional[float] = None
 
 
 @dataclass
@@ -96,15 +101,109 @@ class NNResponseDataclass(BaseDataclass):
 
 
 @dataclass
-class NNQueueCellDataclass(BaseDataclass):
-    """Neural Network cell in queue."""
+class NNQueueJobDataclass(BaseDataclass):
+    """Neural Network job waiting in queue with the request data needed to run it."""
 
+    kind: NNJobEnum
     chat_id: int
     user_id: int
+    role: SystemRoleEnum
+    count_tokens: int
+    data: dict[str, Any]
+    enqueued_at: Optional[float] = None
 
 
 @dataclass
-class NNQueueDataclass(BaseDataclass):
-    """Neural Network queue dataclass."""
+class ChatSummaryDataclass(BaseDataclass):
+    """Running summary of folded chat messages."""
 
-    cells: list[NNQueueCellDataclass]
+    summary: str
+    summary_message_count: int
+
+
+@dataclass
+class NNMetricsDataclass(BaseDataclass):
+    """Neural Network usage metrics dataclass."""
+
+    requests: int
+    prompt_tokens: int
+    prompt_eval_tokens: int
+    response_tokens: int
+    prompt_cache_hit_rate: float
+    vacancy_cache_hits: int
+    vacancy_cache_misses: int
+    greeting_pool_hits: int
+    greeting_pool_misses: int
+    degraded_requests: int
+    truncated_requests: int
+    failed_turns: int
+    cancelled_turns: int
+
+
+@dataclass
+class NNSchedulerDataclass(BaseDataclass):
+    """Inference scheduler slots occupancy dataclass."""
+
+    concurrency: int
+    running: int
+    waiting: int
+    backlog: int
+    overflowing: int
+    wait_estimate: float
+    service_time: float
+    tier: int
+
+
+@dataclass
+class NNWorkerDataclass(BaseDataclass):
+    """Inference worker status dataclass."""
+
+    worker_id: str
+    is_ready: bool
+    updated_at: float
+    scheduler: NNSchedulerDataclass
+
+
+@dataclass
+class NNPercentilesDataclass(BaseDataclass):
+    """Percentiles of a rolling histogram dataclass."""
+
+    count: int
+    p50: float
+    p95: float
+    p99: float
+
+
+@dataclass
+class NNQueueChangeDataclass(BaseDataclass):
+    """Queue change broadcast with the worker capacity at the time of the change dataclass."""
+
+    chat_id: int
+    concurrency: int
+    service_time: float
+
+
+@dataclass
+class NNTurnDataclass(BaseDataclass):
+    """Token counts of a measured chat turn dataclass."""
+
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+
+
+@dataclass
+class NNTimingsDataclass(BaseDataclass):
+    """Rolling chat turn timings and sizes dataclass."""
+
+    wait: NNPercentilesDataclass
+    service: NNPercentilesDataclass
+    prompt_tokens: NNPercentilesDataclass
+    response_tokens: NNPercentilesDataclass
+
+
+@dataclass
+class VacancyCacheDataclass(BaseDataclass):
+    """Cached job posting validation verdict and converted text."""
+
+    verdict: str
+    content: str
@@ -0,0 +1,12 @@
+from typing import Awaitable, Callable
+
+from src.config import settings
+from src.dto.chats_dto import MessageDataclass
+
+ChunkCallback = Callable[[str], Awaitable[None]]
+
+
+def tokens_estimate(messages: list[MessageDataclass]) -> int:
+    """Roughly estimate the number of prompt tokens in messages."""
+    count_chars = sum(len(message.content) for message in messages)
+    return int(count_chars / settings.ollama_chars_per_token) + 4 * len(messages)
@@ -0,0 +1,329 @@
+import asyncio
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import Any, AsyncIterator, Callable, Coroutine, Optional
+
+from src.config import settings
+from src.dto.chats_dto import MessageDataclass, NNSchedulerDataclass
+from src.engines.generally_engine import ChunkCallback, tokens_estimate
+from src.engines.ollama_engine import ollama_request
+from src.engines.openai_engine import openai_request
+from src.models.chats_models import NNResponseModel
+from src.models.generally_models import NNTaskEnum
+
+
+class InferenceEngine(ABC):
+    """Inference backend interface."""
+
+    name: str
+
+    @abstractmethod
+    async def request(
+        self,
+        messages: list[MessageDataclass],
+        chat_id: Optional[int] = None,
+        count_tokens: Optional[int] = None,
+        on_chunk: Optional[ChunkCallback] = None,
+        task: NNTaskEnum = NNTaskEnum.INTERVIEW,
+        num_predict: Optional[int] = None,
+        tier: int = 0,
+    ) -> NNResponseModel:
+        """Send messages of the task to the backend at the degradation tier and return the response."""
+
+
+class OllamaEngine(InferenceEngine):
+    """Inference on the Ollama nodes pool."""
+
+    name = 'ollama'
+
+    async def request(
+        self,
+        messages: list[MessageDataclass],
+        chat_id: Optional[int] = None,
+        count_tokens: Optional[int] = None,
+        on_chunk: Optional[ChunkCallback] = None,
+        task: NNTaskEnum = NNTaskEnum.INTERVIEW,
+        num_predict: Optional[int] = None,
+        tier: int = 0,
+    ) -> NNResponseModel:
+        """Send messages to Ollama and return the response."""
+        return await ollama_request(
+            messages=messages,
+            chat_id=chat_id,
+            count_tokens=count_tokens,
+            on_chunk=on_chunk,
+            task=task,
+            num_predict=num_predict,
+            tier=tier,
+        )
+
+
+class OpenAIEngine(InferenceEngine):
+    """Inference on an OpenAI-compatible API."""
+
+    name = 'openai'
+
+    async def request(
+        self,
+        messages: list[MessageDataclass],
+        chat_id: Optional[int] = None,
+        count_tokens: Optional[int] = None,
+        on_chunk: Optional[ChunkCallback] = None,
+        task: NNTaskEnum = NNTaskEnum.INTERVIEW,
+        num_predict: Optional[int] = None,
+        tier: int = 0,
+    ) -> NNResponseModel:
+        """Send messages to the OpenAI-compatible API and return the response, degradation tiers do not apply."""
+        if count_tokens is None:
+            count_tokens = tokens_estimate(messages)
+        return await openai_request(
+            messages=messages, count_tokens=count_tokens, on_chunk=on_chunk, task=task, num_predict=num_predict
+        )
+
+
+class InferenceRouter:
+    """Routing policy which sends requests of overflowed jobs to the secondary engine."""
+
+    def __init__(self, primary: InferenceEngine, secondary: Optional[InferenceEngine]):
+        self.primary = primary
+        self.secondary = secondary
+
+    def engine_choose(self) -> InferenceEngine:
+        """Choose the engine for a new request."""
+        if self.secondary is not None and inference_overflow.get():
+            return self.secondary
+        return self.primary
+
+    async def request(
+        self,
+        messages: list[MessageDataclass],
+        chat_id: Optional[int] = None,
+        count_tokens: Optional[int] = None,
+        on_chunk: Optional[ChunkCallback] = None,
+        task: NNTaskEnum = NNTaskEnum.INTERVIEW,
+        num_predict: Optional[int] = None,
+    ) -> NNResponseModel:
+        """Send messages to the chosen engine at the tier of the current job and return the response."""
+        return await self.engine_choose().request(
+            messages=messages,
+            chat_id=chat_id,
+            count_tokens=count_tokens,
+            on_chunk=on_chunk,
+            task=task,
+            num_predict=num_predict,
+            tier=inference_tier.get(),
+        )
+
+
+class InferenceScheduler:
+    """FIFO scheduler running inference jobs on as many slots as the primary backend serves in parallel.
+
+    When all slots are busy and the estimated wait exceeds the overflow limit,
+    the job runs at once with its requests routed to the secondary engine.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self.running: list[int] = []
+        self.waiting: deque[tuple[int, asyncio.Future[None]]] = deque()
+        self.overflowing: list[int] = []
+        self.jobs: dict[int, asyncio.Task[Any]] = {}
+        self.backlog = 0
+        self.service_time = settings.inference_service_time
+        self.tier = 0
+
+    def wait_estimate(self) -> float:
+        """Estimate how long a new job would wait for a slot, counting jobs still unclaimed in the queue."""
+        if len(self.running) < self.concurrency:
+            return 0.0
+        return (len(self.waiting) + self.backlog + 1) * self.service_time / self.concurrency
+
+    def is_overflowing(self) -> bool:
+        """Check whether the estimated wait is too long for a new job to wait for a slot."""
+        return settings.inference_overflow_wait is not None and self.wait_estimate() > settings.inference_overflow_wait
+
+    def occupancy(self) -> NNSchedulerDataclass:
+        """Get the current slots occupancy."""
+        return NNSchedulerDataclass(
+            concurrency=self.concurrency,
+            running=len(self.running),
+            waiting=len(self.waiting),
+            backlog=self.backlog,
+            overflowing=len(self.overflowing),
+            wait_estimate=self.wait_estimate(),
+            service_time=self.service_time,
+            tier=self.tier,
+        )
+
+    def slot_try_take(self, chat_id: int) -> bool:
+        """Take a slot only when one is free and no job waits for it."""
+        if len(self.running) < self.concurrency and not self.waiting:
+            self.running.append(chat_id)
+            return True
+        return False
+
+    async def slot_wait(self, chat_id: int) -> None:
+        """Wait in arrival order until a slot is free and take it."""
+        if self.slot_try_take(chat_id):
+            return
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self.waiting.append((chat_id, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if (chat_id, future) in self.waiting:
+                self.waiting.remove((chat_id, future))
+            elif future.done() and not future.cancelled():
+                self.slot_release(chat_id)
+            raise
+
+    def slot_release(self, chat_id: int) -> None:
+        """Free the slot of the chat and hand it to the next waiting job."""
+        self.running.remove(chat_id)
+        while self.waiting and len(self.running) < self.concurrency:
+            next_chat_id, future = self.waiting.popleft()
+            if future.done():
+                continue
+            self.running.append(next_chat_id)
+            future.set_result(None)
+
+    def tier_update(self) -> int:
+        """Step the degradation tier by the estimated wait, stepping back only well below the entry threshold."""
+        wait = self.wait_estimate()
+        tiers = settings.inference_tiers
+
+        while self.tier < len(tiers) and wait > tiers[self.tier].wait:
+            self.tier += 1
+        while self.tier > 0 and wait < tiers[self.tier - 1].wait * settings.inference_tier_exit_ratio:
+            self.tier -= 1
+
+        return self.tier
+
+    async def job_run(
+        self,
+        chat_id: int,
+        job: Callable[[], Coroutine[Any, Any, Any]],
+        on_failure: Optional[Callable[[], Coroutine[Any, Any, Any]]] = None,
+    ) -> None:
+        """Run the chat job in its own task registered by chat ID, cancelling the job it supersedes.
+
+        When the job fails on_failure runs before the error is raised, so the job does not stay queued.
+        """
+        previous_task = self.jobs.get(chat_id)
+        if previous_task is not None:
+            previous_task.cancel()
+
+        task = asyncio.create_task(job())
+        self.jobs[chat_id] = task
+        try:
+            await task
+        except asyncio.CancelledError:
+            current_task = asyncio.current_task()
+            if current_task is not None and current_task.cancelling():
+                task.cancel()
+                raise
+        except Exception:
+            if on_failure is not None:
+                await on_failure()
+            raise
+        finally:
+            if self.jobs.get(chat_id) is task:
+                del self.jobs[chat_id]
+
+    def job_cancel(self, chat_id: int) -> bool:
+        """Cancel the queued or running job of the chat, aborting its inference request."""
+        task = self.jobs.get(chat_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    @asynccontextmanager
+    async def slot_acquire(self, chat_id: int) -> AsyncIterator[None]:
+        """Hold an inference slot for the chat job while the context is open.
+
+        The degradation tier of the job is chosen on arrival from the backlog it joins.
+        """
+        tier_token = inference_tier.set(self.tier_update())
+        try:
+            async with self.slot_hold(chat_id=chat_id):
+                yield
+        finally:
+            inference_tier.reset(tier_token)
+
+    @asynccontextmanager
+    async def slot_hold(self, chat_id: int) -> AsyncIterator[None]:
+        """Take a free slot in arrival order or overflow to the secondary engine when the wait is too long."""
+        if self.is_overflowing():
+            token = inference_overflow.set(True)
+            self.overflowing.append(chat_id)
+            try:
+                yield
+            finally:
+                self.overflowing.remove(chat_id)
+                inference_overflow.reset(token)
+            return
+
+        await self.slot_wait(chat_id)
+        started_at = monotonic()
+        try:
+            yield
+        finally:
+            self.slot_release(chat_id)
+            alpha = settings.inference_service_time_smoothing
+            self.service_time = (1 - alpha) * self.service_time + alpha * (monotonic() - started_at)
+
+
+inference_overflow: ContextVar[bool] = ContextVar('inference_overflow', default=False)
+inference_tier: ContextVar[int] = ContextVar('inference_tier', default=0)
+inference_router: InferenceRouter | None = None
+inference_scheduler: InferenceScheduler | None = None
+
+
+def init_inference() -> InferenceRouter:
+    """Initialization the inference router and scheduler with engines and slots from settings."""
+    global inference_router, inference_scheduler
+    secondary = OpenAIEngine() if settings.inference_overflow_wait is not None else None
+    inference_router = InferenceRouter(primary=OllamaEngine(), secondary=secondary)
+    inference_scheduler = InferenceScheduler(concurrency=settings.inference_concurrency)
+    return inference_router
+
+
+def get_inference_router() -> InferenceRouter:
+    """Get inference router."""
+    if inference_router is None:
+        raise RuntimeError('Inference router is not initialized')
+    return inference_router
+
+
+def get_inference_scheduler() -> InferenceScheduler:
+    """Get inference scheduler."""
+    if inference_scheduler is None:
+        raise RuntimeError('Inference scheduler is not initialized')
+    return inference_scheduler
+
+
+async def inference_request(
+    messages: list[MessageDataclass],
+    chat_id: Optional[int] = None,
+    count_tokens: Optional[int] = None,
+    on_chunk: Optional[ChunkCallback] = None,
+    task: NNTaskEnum = NNTaskEnum.INTERVIEW,
+    num_predict: Optional[int] = None,
+) -> NNResponseModel:
+    """Send messages to the inference backend chosen by the routing policy and return the response.
+
+    num_predict caps the reply length in tokens, a reply cut by it is marked as truncated.
+    """
+    return await get_inference_router().request(
+        messages=messages,
+        chat_id=chat_id,
+        count_tokens=count_tokens,
+        on_chunk=on_chunk,
+        task=task,
+        num_predict=num_predict,
+    )
@@ -1,37 +1,452 @@
-from dataclasses import asdict
+import asyncio
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from json import loads
+from time import monotonic
+from typing import Any, Optional
 
 import httpx
 
 from src.config import settings
 from src.dto.chats_dto import MessageDataclass
+from src.engines.generally_engine import ChunkCallback, tokens_estimate
 from src.models.chats_models import NNResponseModel
-from src.models.generally_models import NNRoleEnum
+from src.models.generally_models import NNRoleEnum, NNTaskEnum
 
 
-async def ollama_request(messages: list[MessageDataclass]) -> NNResponseModel:
-    """Send a request to the Ollama engine and return the response."""
+@dataclass
+class OllamaNode:
+    """Ollama backend node with its routing state."""
+
+    url: str
+    in_flight: int = 0
+    is_healthy: bool = True
+    is_warm: bool = False
+    failures: int = 0
+    opened_at: Optional[float] = None
+
+    def is_available(self) -> bool:
+        """Check that the circuit breaker lets requests through, a single probe once the cooldown has passed."""
+        if self.opened_at is None:
+            return True
+        return monotonic() - self.opened_at >= settings.ollama_breaker_cooldown and self.in_flight == 0
+
+    def failure_record(self) -> None:
+        """Count a failed request and open the circuit breaker after too many failures in a row."""
+        self.failures += 1
+        if self.failures >= settings.ollama_breaker_failures:
+            self.opened_at = monotonic()
+
+    def success_record(self) -> None:
+        """Close the circuit breaker after a successful request."""
+        self.failures = 0
+        self.opened_at = None
+
+
+class OllamaNodePool:
+    """Pool of Ollama nodes with least-outstanding-requests routing sticky per chat."""
+
+    def __init__(self, urls: list[str]):
+        self.nodes = [OllamaNode(url=url) for url in urls]
+        self.sticky_nodes: OrderedDict[int, OllamaNode] = OrderedDict()
+        self.is_warmed_up = False
+        self.latencies: deque[float] = deque(maxlen=settings.ollama_hedge_window)
+
+    @property
+    def is_ready(self) -> bool:
+        """Check that the startup warm-up has finished and at least one node has the models loaded."""
+        return self.is_warmed_up and any(node.is_warm for node in self.nodes)
+
+    def node_choose(self, chat_id: Optional[int] = None) -> OllamaNode:
+        """Choose the node for a request, keeping the chat on its previous node while it is not overloaded."""
+        candidates = [node for node in self.nodes if node.is_healthy and node.is_available()] or self.nodes
+        least_loaded = min(candidates, key=lambda node: node.in_flight)
+
+        if chat_id is None:
+            return least_loaded
+
+        node = self.sticky_nodes.get(chat_id)
+        if (
+            node is None
+            or node not in candidates
+            or node.in_flight > least_loaded.in_flight + settings.ollama_sticky_max_skew
+        ):
+            node = least_loaded
+
+        self.sticky_nodes[chat_id] = node
+        self.sticky_nodes.move_to_end(chat_id)
+        if len(self.sticky_nodes) > settings.ollama_sticky_max_chats:
+            self.sticky_nodes.popitem(last=False)
+
+        return node
+
+    def node_choose_other(self, exclude: list[OllamaNode]) -> Optional[OllamaNode]:
+        """Choose the least loaded available node besides the excluded ones for a retry or a hedge."""
+        candidates = [node for node in self.nodes if node not in exclude and node.is_healthy and node.is_available()]
+        return min(candidates, key=lambda node: node.in_flight) if candidates else None
+
+    def latency_record(self, latency: float) -> None:
+        """Remember the time to the first chunk of a request."""
+        self.latencies.append(latency)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Get the time to the first chunk after which a request is hedged, None while hedging is off."""
+        if settings.ollama_hedge_percentile is None or len(self.latencies) < settings.ollama_hedge_min_samples:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[int(settings.ollama_hedge_percentile * (len(latencies) - 1))]
+
+    async def health_check(self, client: httpx.AsyncClient) -> None:
+        """Check all nodes concurrently and update their health flags."""
+
+        async def node_check(node: OllamaNode) -> None:
+            try:
+                response = await client.get(f'{node.url}/api/tags', timeout=settings.ollama_health_check_timeout)
+                node.is_healthy = response.status_code == 200
+            except httpx.HTTPError:
+                node.is_healthy = False
+
+        await asyncio.gather(*(node_check(node) for node in self.nodes))
+
+    async def warmup(self, client: httpx.AsyncClient, nodes: list[OllamaNode]) -> None:
+        """Load all models on the nodes concurrently with an empty generation and refresh their keep-alive."""
+
+        async def node_warmup(node: OllamaNode) -> None:
+            try:
+                for model in settings.ollama_models:
+                    response = await client.post(
+                        f'{node.url}/api/generate',
+                        json={
+                            'model': model,
+                            'prompt': '',
+                            'options': {'num_ctx': min(settings.ollama_num_ctx_buckets)},
+                            'keep_alive': settings.ollama_keep_alive,
+                        },
+                    )
+                    response.raise_for_status()
+                node.is_warm = True
+            except httpx.HTTPError:
+                node.is_warm = False
+
+        await asyncio.gather(*(node_warmup(node) for node in nodes))
+        self.is_warmed_up = True
+
+
+ollama_client: httpx.AsyncClient | None = None
+ollama_pool: OllamaNodePool | None = None
+
+
+async def init_ollama() -> httpx.AsyncClient:
+    """Initialization the shared Ollama HTTP client with pool limits and timeouts from settings."""
+    global ollama_client, ollama_pool
+    ollama_pool = OllamaNodePool(urls=settings.ollama_urls)
+    ollama_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.ollama_max_connections,
+            max_keepalive_connections=settings.ollama_max_keepalive_connections,
+            keepalive_expiry=settings.ollama_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.ollama_connect_timeout,
+            read=settings.ollama_first_chunk_timeout,
+            write=settings.ollama_connect_timeout,
+            pool=settings.ollama_pool_timeout,
+        ),
+    )
+    return ollama_client
+
+
+async def close_ollama() -> None:
+    """Close Ollama client connections."""
+    global ollama_client, ollama_pool
+    if ollama_client is not None:
+        await ollama_client.aclose()
+        ollama_client = None
+    ollama_pool = None
+
+
+def get_ollama_client() -> httpx.AsyncClient:
+    """Get shared Ollama HTTP client."""
+    if ollama_client is None:
+        raise RuntimeError('Ollama client is not initialized')
+    return ollama_client
+
+
+def get_ollama_pool() -> OllamaNodePool:
+    """Get Ollama nodes pool."""
+    if ollama_pool is None:
+        raise RuntimeError('Ollama nodes pool is not initialized')
+    return ollama_pool
+
+
+async def ollama_health_check_loop() -> None:
+    """Periodically check the health of all Ollama nodes."""
+    while True:
+        await get_ollama_pool().health_check(client=get_ollama_client())
+        await asyncio.sleep(settings.ollama_health_check_interval)
+
+
+async def ollama_warmup_loop() -> None:
+    """Warm up all Ollama nodes at startup and keep the models loaded.
+
+    Nodes which failed to load are retried every interval, and during busy hours
+    every node is pinged so the models are not unloaded between requests.
+    """
+    pool, client = get_ollama_pool(), get_ollama_client()
+    await pool.warmup(client=client, nodes=pool.nodes)
+
+    while True:
+        await asyncio.sleep(settings.ollama_warmup_interval)
+        if datetime.now().hour in settings.ollama_busy_hours:
+            await pool.warmup(client=client, nodes=pool.nodes)
+        else:
+            await pool.warmup(client=client, nodes=[node for node in pool.nodes if not node.is_warm])
+
+
+def num_ctx_choose(count_tokens: int) -> int:
+    """Choose the smallest context bucket fitting the prompt with headroom for the response."""
+    required = count_tokens + settings.ollama_num_ctx_headroom
+    buckets = sorted(settings.ollama_num_ctx_buckets)
+
+    for bucket in buckets:
+        if bucket >= required:
+            return bucket
+
+    return buckets[-1]
+
+
+def ollama_task_config(
+    task: NNTaskEnum, count_tokens: int, num_predict: Optional[int] = None, tier: int = 0
+) -> tuple[str, dict[str, Any]]:
+    """Get the model and options of the task, lightened by every tier up to the given one for interview turns."""
+    model = settings.ollama_task_models.get(task, settings.ollama_model)
+    options = {'num_ctx': num_ctx_choose(count_tokens), **settings.ollama_task_options.get(task, {})}
+    if num_predict:
+        options['num_predict'] = num_predict
+
+    if task != NNTaskEnum.INTERVIEW:
+        return model, options
+
+    for inference_tier in settings.inference_tiers[:tier]:
+        model = inference_tier.model or model
+        if inference_tier.num_ctx:
+            options['num_ctx'] = min(options['num_ctx'], inference_tier.num_ctx)
+        if inference_tier.num_predict:
+            options['num_predict'] = min(
+                options.get('num_predict', inference_tier.num_predict), inference_tier.num_predict
+            )
+
+    return model, options
+
+
+async def ollama_stream(
+    client: httpx.AsyncClient, url: str, payload: dict[str, Any], on_chunk: ChunkCallback
+) -> dict[str, Any]:
+    """Consume Ollama NDJSON chunks, forward content pieces and return the assembled final response.
+
+    Prompt evaluation before the first chunk is bounded only by the long first chunk timeout of the client,
+    while a stall between chunks fails after the short read timeout.
+    """
+    content_parts: list[str] = []
+    data: dict[str, Any] = {}
+
+    async with client.stream('POST', url, json=payload) as response:
+        response.raise_for_status()
+        lines = response.aiter_lines()
+        while True:
+            try:
+                async with asyncio.timeout(settings.ollama_read_timeout if data else None):
+                    line = await lines.__anext__()
+            except StopAsyncIteration:
+                break
+
+            if not line:
+                continue
+
+            data = loads(line)
+            if 'error' in data:
+                raise httpx.HTTPError(data['error'])
+
+            piece = data.get('message', {}).get('content', '')
+            if piece:
+                content_parts.append(piece)
+                await on_chunk(piece)
+
+            if data.get('done'):
+                break
+
+    if not data.get('done'):
+        raise httpx.HTTPError('Ollama stream ended before done')
+
+    data['message'] = {'role': NNRoleEnum.ASSISTANT, 'content': ''.join(content_parts)}
+    return data
+
+
+async def ollama_call(
+    client: httpx.AsyncClient, node: OllamaNode, payload: dict[str, Any], on_chunk: ChunkCallback
+) -> dict[str, Any]:
+    """Stream the payload to the node within the request deadline, feeding its circuit breaker."""
+    node.in_flight += 1
+    try:
+        async with asyncio.timeout(settings.ollama_request_deadline):
+            data = await ollama_stream(client=client, url=f'{node.url}/api/chat', payload=payload, on_chunk=on_chunk)
+    except (httpx.HTTPError, TimeoutError):
+        node.failure_record()
+        raise
+    finally:
+        node.in_flight -= 1
+
+    node.success_record()
+    return data
+
+
+class OllamaCall:
+    """Chat request raced across attempts on different nodes of the pool.
+
+    When the first chunk takes longer than the latency percentile the request is duplicated on another node.
+    The first attempt producing a chunk wins and the others are cancelled, so only the winner reaches on_chunk.
+    An attempt failing before any chunk is retried on another node.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        pool: OllamaNodePool,
+        payload: dict[str, Any],
+        on_chunk: Optional[ChunkCallback] = None,
+    ):
+        self.client = client
+        self.pool = pool
+        self.payload = payload
+        self.on_chunk = on_chunk
+        self.attempts: dict[asyncio.Task[dict[str, Any]], OllamaNode] = {}
+        self.tried_nodes: list[OllamaNode] = []
+        self.winner: Optional[asyncio.Task[Any]] = None
+        self.error: Optional[BaseException] = None
+        self.retries = 0
+
+    def attempt_start(self, node: OllamaNode) -> None:
+        """Start an attempt on the node."""
+        started_at = monotonic()
+
+        async def on_node_chunk(piece: str) -> None:
+            task = asyncio.current_task()
+            if self.winner is None and task is not None:
+                self.winner_choose(task=task, latency=monotonic() - started_at)
+            if self.winner is task and self.on_chunk is not None:
+                await self.on_chunk(piece)
+
+        self.tried_nodes.append(node)
+        task = asyncio.create_task(
+            ollama_call(client=self.client, node=node, payload=self.payload, on_chunk=on_node_chunk)
+        )
+        self.attempts[task] = node
+
+    def winner_choose(self, task: asyncio.Task[Any], latency: float) -> None:
+        """Make the attempt which produced the first chunk the winner and cancel the others."""
+        self.winner = task
+        self.pool.latency_record(latency)
+        for other in self.attempts:
+            if other is not task:
+                other.cancel()
+
+    def attempts_collect(self, done: set[asyncio.Task[dict[str, Any]]]) -> Optional[dict[str, Any]]:
+        """Collect finished attempts and return the first successful response."""
+        for task in done:
+            del self.attempts[task]
+            if task.cancelled():
+                continue
+
+            error = task.exception()
+            if error is None:
+                return task.result()
+            if self.winner is task:
+                raise error
+            self.error = error
+
+        if not self.attempts and self.winner is None and self.retries < settings.ollama_max_retries:
+            retry_node = self.pool.node_choose_other(exclude=self.tried_nodes)
+            if retry_node is not None:
+                self.retries += 1
+                self.attempt_start(retry_node)
+
+        return None
+
+    async def run(self, chat_id: Optional[int] = None) -> dict[str, Any]:
+        """Run the request and return the winning response."""
+        self.attempt_start(self.pool.node_choose(chat_id=chat_id))
+        hedge_delay = self.pool.hedge_delay()
+
+        try:
+            while self.attempts:
+                done, _ = await asyncio.wait(self.attempts, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedge_delay = None
+                    hedge_node = self.pool.node_choose_other(exclude=self.tried_nodes)
+                    if hedge_node is not None and self.winner is None:
+                        self.attempt_start(hedge_node)
+                    continue
+
+                data = self.attempts_collect(done)
+                if data is not None:
+                    return data
+        finally:
+            for task in self.attempts:
+                task.cancel()
+
+        raise self.error or httpx.HTTPError('No Ollama node answered')
+
+
+async def ollama_request(
+    messages: list[MessageDataclass],
+    chat_id: Optional[int] = None,
+    count_tokens: Optional[int] = None,
+    on_chunk: Optional[ChunkCallback] = None,
+    task: NNTaskEnum = NNTaskEnum.INTERVIEW,
+    num_predict: Optional[int] = None,
+    tier: int = 0,
+) -> NNResponseModel:
+    """Send a request to the least loaded Ollama node and return the response.
+
+    Requests of the same chat stay on one node where possible to keep its prompt cache warm.
+    The model and options are configured per task, and interview turns get lighter ones in a degraded tier.
+    The context size is picked from a few buckets by count_tokens, or by an estimate when it is unknown.
+    When on_chunk is given every content piece is passed to it as it arrives.
+    Every attempt has a deadline, failing nodes are skipped by their circuit breakers and slow ones are hedged.
+    Ollama reports only the prompt tokens it had to evaluate, so a prompt cache hit makes prompt_eval_count
+    smaller than the prompt and the known prompt size is kept in count_request_tokens.
+    """
     ollama_context = [
         {key: value for key, value in asdict(message).items() if key in ('role', 'content')} for message in messages
     ]
-    ollama_url = settings.ollama_url
+    if count_tokens is None:
+        count_tokens = tokens_estimate(messages)
 
+    model, options = ollama_task_config(task=task, count_tokens=count_tokens, num_predict=num_predict, tier=tier)
     payload = {
-        'model': settings.ollama_model,
-        'options': {
-            'num_ctx': 65536,
-        },
+        'model': model,
+        'options': options,
         'messages': ollama_context,
-        'stream': False,
+        'stream': True,
         'think': False,
+        'keep_alive': settings.ollama_keep_alive,
     }
 
-    async with httpx.AsyncClient(timeout=3600) as client:
-        response = await client.post(ollama_url, json=payload)
-        data = response.json()
+    ollama_chat_call = OllamaCall(
+        client=get_ollama_client(), pool=get_ollama_pool(), payload=payload, on_chunk=on_chunk
+    )
+    data = await ollama_chat_call.run(chat_id=chat_id)
+
+    count_prompt_eval_tokens = data.get('prompt_eval_count', 0)
 
     return NNResponseModel(
-        count_request_tokens=data['prompt_eval_count'],
+        count_request_tokens=max(count_prompt_eval_tokens, count_tokens),
         count_response_tokens=data['eval_count'],
+        count_prompt_eval_tokens=count_prompt_eval_tokens,
         role=NNRoleEnum.ASSISTANT,
         content=data['message']['content'],
+        tier=tier,
+        is_truncated=data.get('done_reason') == 'length',
     )
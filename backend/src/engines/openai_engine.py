@@ -0,0 +1,108 @@
+from typing import Optional, cast
+
+from openai import NOT_GIVEN, AsyncOpenAI
+from openai.types.chat import ChatCompletionMessageParam
+
+from src.config import settings
+from src.dto.chats_dto import MessageDataclass
+from src.engines.generally_engine import ChunkCallback
+from src.models.chats_models import NNResponseModel
+from src.models.generally_models import NNRoleEnum, NNTaskEnum
+
+openai_client: AsyncOpenAI | None = None
+
+
+async def init_openai() -> AsyncOpenAI:
+    """Initialization the OpenAI-compatible API client with parameters from settings."""
+    global openai_client
+    openai_client = AsyncOpenAI(
+        api_key=settings.gpt_api_key.get_secret_value(),
+        base_url=settings.openai_base_url,
+        timeout=settings.openai_timeout,
+        max_retries=0,
+    )
+    return openai_client
+
+
+async def close_openai() -> None:
+    """Close OpenAI-compatible API client connections."""
+    global openai_client
+    if openai_client is not None:
+        await openai_client.close()
+        openai_client = None
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Get OpenAI-compatible API client."""
+    if openai_client is None:
+        raise RuntimeError('OpenAI client is not initialized')
+    return openai_client
+
+
+async def openai_request(
+    messages: list[MessageDataclass],
+    count_tokens: int,
+    on_chunk: Optional[ChunkCallback] = None,
+    task: NNTaskEnum = NNTaskEnum.INTERVIEW,
+    num_predict: Optional[int] = None,
+) -> NNResponseModel:
+    """Send a request to the OpenAI-compatible API and return the response.
+
+    When on_chunk is given the completion is streamed and every content piece is passed to it as it arrives.
+    The stop sequences of the task are the same as for Ollama.
+    """
+    client = get_openai_client()
+    model = settings.openai_task_models.get(task, settings.openai_model)
+    openai_context = [
+        cast(ChatCompletionMessageParam, {'role': message.role, 'content': message.content}) for message in messages
+    ]
+
+    max_tokens = num_predict or NOT_GIVEN
+    stop = settings.ollama_task_options.get(task, {}).get('stop', NOT_GIVEN)
+
+    content_parts: list[str] = []
+    usage = None
+    finish_reason = None
+
+    if on_chunk is None:
+        completion = await client.chat.completions.create(
+            model=model,
+            messages=openai_context,
+            max_tokens=max_tokens,
+            stop=stop,
+        )
+        content_parts.append(completion.choices[0].message.content or '')
+        finish_reason = completion.choices[0].finish_reason
+        usage = completion.usage
+    else:
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=openai_context,
+            max_tokens=max_tokens,
+            stop=stop,
+            stream=True,
+            stream_options={'include_usage': True},
+        )
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            if chunk.choices[0].delta.content:
+                content_parts.append(chunk.choices[0].delta.content)
+                await on_chunk(chunk.choices[0].delta.content)
+
+    count_request_tokens = usage.prompt_tokens if usage else count_tokens
+    count_cached_tokens = 0
+    if usage and usage.prompt_tokens_details and usage.prompt_tokens_details.cached_tokens:
+        count_cached_tokens = usage.prompt_tokens_details.cached_tokens
+
+    return NNResponseModel(
+        count_request_tokens=count_request_tokens,
+        count_response_tokens=usage.completion_tokens if usage else 0,
+        count_prompt_eval_tokens=count_request_tokens - count_cached_tokens,
+        role=NNRoleEnum.ASSISTANT,
+        content=''.join(content_parts),
+        is_truncated=finish_reason == 'length',
+    )
@@ -1,7 +1,8 @@
-from typing import Annotated, Awaitable, Optional
+from typing import Annotated, Any, Awaitable, Mapping, Optional
 
 from fastapi import Depends
 from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
 
 from src.config import settings
 
@@ -64,6 +65,130 @@ class AsyncRedis:
         assert isinstance(result, Awaitable)
         return result
 
+    def expire(self, name: str, time: int) -> Awaitable[bool]:
+        """Set asynchronously a key expiration time in Redis."""
+        result = self.redis_engine.expire(name, time)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def zadd(self, name: str, mapping: Mapping[str, float], xx: bool = False) -> Awaitable[int]:
+        """Add asynchronously members with scores to a sorted set in Redis, only updating existing ones with xx."""
+        result = self.redis_engine.zadd(name, dict(mapping), xx=xx)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def zcard(self, name: str) -> Awaitable[int]:
+        """Get asynchronously the number of members of a sorted set in Redis."""
+        result = self.redis_engine.zcard(name)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def zpopmin(self, name: str, count: int = 1) -> Awaitable[list[tuple[str, float]]]:
+        """Pop asynchronously members with the lowest scores from a sorted set in Redis."""
+        result = self.redis_engine.zpopmin(name, count)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def zrank(self, name: str, value: str) -> Awaitable[Optional[int]]:
+        """Get asynchronously the rank of a sorted set member from the lowest score in Redis."""
+        result = self.redis_engine.zrank(name, value)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def zremrangebyscore(self, name: str, min_score: float | str, max_score: float | str) -> Awaitable[int]:
+        """Remove asynchronously sorted set members with scores in a range in Redis."""
+        result = self.redis_engine.zremrangebyscore(name, min_score, max_score)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def zincrby(self, name: str, amount: float, value: str) -> Awaitable[float]:
+        """Increment asynchronously the score of a sorted set member in Redis."""
+        result = self.redis_engine.zincrby(name, amount, value)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def zrevrange(self, name: str, start: int, end: int) -> Awaitable[list[str]]:
+        """Get asynchronously sorted set members from the highest score in Redis."""
+        result = self.redis_engine.zrevrange(name, start, end)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def rpush(self, name: str, *values: str) -> Awaitable[int]:
+        """Append asynchronously values to a list in Redis."""
+        result = self.redis_engine.rpush(name, *values)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def lpop(self, name: str) -> Awaitable[Optional[str]]:
+        """Pop asynchronously the first value of a list in Redis."""
+        result = self.redis_engine.lpop(name)
+        assert isinstance(result, Awaitable)
+        return result  # type: ignore[return-value]
+
+    def lrange(self, name: str, start: int, end: int) -> Awaitable[list[str]]:
+        """Get asynchronously a range of list values in Redis."""
+        result = self.redis_engine.lrange(name, start, end)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def lindex(self, name: str, index: int) -> Awaitable[Optional[str]]:
+        """Get asynchronously the list value at the index in Redis."""
+        result = self.redis_engine.lindex(name, index)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def llen(self, name: str) -> Awaitable[int]:
+        """Get asynchronously the length of a list in Redis."""
+        result = self.redis_engine.llen(name)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def hincrby(self, name: str, key: str, amount: int = 1) -> Awaitable[int]:
+        """Increment asynchronously a hash field in Redis."""
+        result = self.redis_engine.hincrby(name, key, amount)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def hset(self, name: str, mapping: Mapping[str, str]) -> Awaitable[int]:
+        """Set asynchronously hash fields in Redis."""
+        result = self.redis_engine.hset(name, mapping=dict(mapping))
+        assert isinstance(result, Awaitable)
+        return result
+
+    def hdel(self, name: str, *keys: str) -> Awaitable[int]:
+        """Delete asynchronously hash fields in Redis."""
+        result = self.redis_engine.hdel(name, *keys)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def hexists(self, name: str, key: str) -> Awaitable[bool]:
+        """Check asynchronously if a hash field exists in Redis."""
+        result = self.redis_engine.hexists(name, key)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def hgetall(self, name: str) -> Awaitable[dict[str, str]]:
+        """Get asynchronously all fields of a hash in Redis."""
+        result = self.redis_engine.hgetall(name)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def eval(self, script: str, keys: list[str], args: list[str]) -> Awaitable[Any]:
+        """Run asynchronously a Lua script atomically in Redis."""
+        result = self.redis_engine.eval(script, len(keys), *keys, *args)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def publish(self, channel: str, message: str) -> Awaitable[int]:
+        """Publish asynchronously a message to a Redis channel."""
+        result = self.redis_engine.publish(channel, message)
+        assert isinstance(result, Awaitable)
+        return result
+
+    def pubsub(self) -> PubSub:
+        """Create a Redis pub/sub object."""
+        return self.redis_engine.pubsub()
+
 
 def get_redis() -> AsyncRedis:
     """Get async Redis client."""
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from fastapi import HTTPException
 
 from src.config import settings
@@ -16,17 +18,21 @@ class Logger:
         'undefined_error': (500, 'Undefined error'),
         'token_expired': (401, 'Token expired'),
         'data_not_correct': (400, 'Data not correct'),
+        'service_unavailable': (503, 'Service unavailable'),
+        'queue_overloaded': (503, 'Inference queue is overloaded'),
     }
 
     @staticmethod
-    def create_response_error(error_key: str, is_cookie_remove: bool = False) -> HTTPException:
-        """Create response error."""
+    def create_response_error(
+        error_key: str, is_cookie_remove: bool = False, headers: Optional[dict[str, str]] = None
+    ) -> HTTPException:
+        """Create response error with optional extra headers."""
         if error_key not in Logger.errors:
             raise ValueError(f'Unknown error key: {error_key}')
 
         status, detail = Logger.errors[error_key]
 
-        headers = None
+        headers = dict(headers or {})
         if is_cookie_remove:
             samesite = 'None' if settings.develop_mode else 'Lax'
             secure = '' if settings.develop_mode else 'Secure'
@@ -35,6 +41,6 @@ class Logger:
             if secure:
                 cookie += f'; {secure}'
 
-            headers = {'set-cookie': cookie}
+            headers['set-cookie'] = cookie
 
-        return HTTPException(status_code=status, detail=detail, headers=headers)
+        return HTTPException(status_code=status, detail=detail, headers=headers or None)
@@ -10,6 +10,7 @@ import src.utils.redis_utils as redis_utils
 from src.api.admins_api import admins_router
 from src.api.auth_api import auth_router
 from src.api.chats_api import chats_router
+from src.api.health_api import health_router
 from src.api.users_api import users_router
 from src.config import settings
 from src.engines.redis_engine import close_redis, init_redis
@@ -21,14 +22,21 @@ from src.middlewares.auth_middlewares import (
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    """Application startup and shutdown lifecycle."""
+    """Application startup and shutdown lifecycle.
+
+    Inference runs in separate worker processes (src.worker), the API only queues chat turns.
+    """
     redis_client = await init_redis()
-    listener_task = asyncio.create_task(redis_utils.listen_redis_chat_expired(redis_client=redis_client))
+    background_tasks = [
+        asyncio.create_task(redis_utils.listen_redis_chat_expired(redis_client=redis_client)),
+    ]
     yield
-    listener_task.cancel()
 
-    with contextlib.suppress(asyncio.CancelledError):
-        await listener_task
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
 
     await close_redis()
 
@@ -54,6 +62,7 @@ app.include_router(auth_router)
 app.include_router(chats_router)
 app.include_router(users_router)
 app.include_router(admins_router)
+app.include_router(health_router)
 
 
 if __name__ == '__main__':
@@ -10,7 +10,7 @@ from src.engines.redis_engine import get_redis
 from src.models.generally_models import SystemRoleEnum
 from src.schemas import UserSchema
 
-AUTH_EXCLUDED_PATHS = {'/auth/login', '/auth/login/', '/auth/'}
+AUTH_EXCLUDED_PATHS = {'/auth/login', '/auth/login/', '/auth/', '/health/ready'}
 
 
 class AnonymousUserTokenMiddleware(BaseHTTPMiddleware):
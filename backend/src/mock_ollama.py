@@ -0,0 +1,265 @@
+"""Local stand-in for the Ollama HTTP API used for deterministic performance testing.
+
+Run with ``python -m src.mock_ollama`` and point ``OLLAMA_HOST``/``OLLAMA_PORT`` (or ``OLLAMA_NODES``) at it.
+The OpenAI-compatible ``/v1/chat/completions`` endpoint lets ``OPENAI_BASE_URL`` point at it as well.
+The server never touches the network and is configured with ``MOCK_OLLAMA_*`` environment variables.
+"""
+
+import asyncio
+from json import dumps
+from random import Random
+from time import perf_counter_ns
+from typing import Any, AsyncGenerator, Literal
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+WORDS = ['OK', 'интервью', 'вопрос', 'ответ', 'опыт', 'проект', 'код', 'задача', 'решение', 'система']
+
+
+class MockOllamaSettings(BaseSettings):
+    """Mock Ollama configuration loaded from environment variables with the MOCK_OLLAMA_ prefix."""
+
+    host: str = '127.0.0.1'
+    port: int = 11434
+    models: list[str] = ['mock']
+    seed: int = 0
+
+    num_parallel: int = 1
+    cache_slots: int = 4
+    chars_per_token: float = 3.0
+
+    response_tokens: int = 40
+    prompt_token_latency: float = 0.0005
+    token_latency: float = 0.02
+    latency_distribution: Literal['fixed', 'uniform', 'exponential', 'lognormal'] = 'fixed'
+    latency_spread: float = 0.5
+
+    error_rate: float = 0.0
+    stall_rate: float = 0.0
+    stall_seconds: float = 30.0
+
+    model_config = SettingsConfigDict(env_prefix='MOCK_OLLAMA_')
+
+
+class MockOllama:
+    """Simulated Ollama runner with parallel slots, prompt prefix cache and configurable latency and faults."""
+
+    def __init__(self, mock_settings: MockOllamaSettings):
+        self.settings = mock_settings
+        self.random = Random(mock_settings.seed)  # noqa: S311
+        self.slots = asyncio.Semaphore(mock_settings.num_parallel)
+        self.cached_prompts: list[str] = []
+
+    def tokens_count(self, text: str) -> int:
+        """Estimate the number of tokens in text."""
+        return max(1, int(len(text) / self.settings.chars_per_token))
+
+    def latency_sample(self, mean: float) -> float:
+        """Sample latency around mean according to the configured distribution."""
+        spread = self.settings.latency_spread
+        distribution = self.settings.latency_distribution
+
+        if distribution == 'uniform':
+            return self.random.uniform(mean * (1 - spread), mean * (1 + spread))
+        if distribution == 'exponential':
+            return self.random.expovariate(1 / mean) if mean > 0 else 0.0
+        if distribution == 'lognormal':
+            return mean * self.random.lognormvariate(0, spread)
+        return mean
+
+    def prompt_eval_count(self, prompt: str) -> int:
+        """Count prompt tokens not covered by the longest cached prefix and remember the prompt."""
+        cached_chars = 0
+        for cached_prompt in self.cached_prompts:
+            common = 0
+            for left, right in zip(cached_prompt, prompt):
+                if left != right:
+                    break
+                common += 1
+            cached_chars = max(cached_chars, common)
+
+        self.cached_prompts = [prompt, *self.cached_prompts][: self.settings.cache_slots]
+        return self.tokens_count(prompt[cached_chars:])
+
+    def reply_tokens(self, num_predict: int | None) -> tuple[list[str], str]:
+        """Generate reply tokens honouring num_predict and return them with the done reason."""
+        count = max(1, round(self.latency_sample(self.settings.response_tokens)))
+        done_reason = 'stop'
+        if num_predict is not None and 0 < num_predict < count:
+            count, done_reason = num_predict, 'length'
+
+        tokens = [WORDS[0]] + [self.random.choice(WORDS[1:]) for _ in range(count - 1)]
+        return [token if index == 0 else f' {token}' for index, token in enumerate(tokens)], done_reason
+
+    async def fault_inject(self) -> Response | None:
+        """Randomly stall or fail the request according to the configured rates."""
+        if self.random.random() < self.settings.stall_rate:
+            await asyncio.sleep(self.settings.stall_seconds)
+        if self.random.random() < self.settings.error_rate:
+            return JSONResponse(status_code=500, content={'error': 'mock ollama injected error'})
+        return None
+
+    async def chat_generate(self, payload: dict[str, Any]) -> AsyncGenerator[dict[str, Any], None]:
+        """Generate chat response chunks while holding a parallel slot."""
+        messages = payload.get('messages', [])
+        options = payload.get('options') or {}
+        prompt = ''.join(f'{message.get("role")}:{message.get("content")}\n' for message in messages)
+
+        async with self.slots:
+            started_at = perf_counter_ns()
+            prompt_eval_count = self.prompt_eval_count(prompt)
+            await asyncio.sleep(self.latency_sample(self.settings.prompt_token_latency * prompt_eval_count))
+            prompt_evaluated_at = perf_counter_ns()
+
+            tokens, done_reason = self.reply_tokens(options.get('num_predict'))
+            for token in tokens:
+                await asyncio.sleep(self.latency_sample(self.settings.token_latency))
+                yield {'message': {'role': 'assistant', 'content': token}, 'done': False}
+
+            finished_at = perf_counter_ns()
+
+        yield {
+            'message': {'role': 'assistant', 'content': ''},
+            'done': True,
+            'done_reason': done_reason,
+            'total_duration': finished_at - started_at,
+            'load_duration': 0,
+            'prompt_eval_count': prompt_eval_count,
+            'prompt_eval_duration': prompt_evaluated_at - started_at,
+            'eval_count': len(tokens),
+            'eval_duration': finished_at - prompt_evaluated_at,
+        }
+
+    async def chat_response(self, payload: dict[str, Any]) -> dict[str, Any]:
+        """Generate a non-streaming chat response."""
+        content_parts = []
+        async for chunk in self.chat_generate(payload):
+            content_parts.append(chunk['message']['content'])
+
+        return {
+            **chunk,
+            'model': payload.get('model'),
+            'message': {'role': 'assistant', 'content': ''.join(content_parts)},
+        }
+
+    async def chat_stream(self, payload: dict[str, Any]) -> AsyncGenerator[str, None]:
+        """Generate chat response chunks as NDJSON lines."""
+        async for chunk in self.chat_generate(payload):
+            yield dumps({'model': payload.get('model'), **chunk}, ensure_ascii=False) + '\n'
+
+    def completion_usage(self, messages: list[dict[str, Any]], chunk: dict[str, Any]) -> dict[str, Any]:
+        """Build OpenAI-compatible usage from the final chat chunk."""
+        prompt_tokens = self.tokens_count(
+            ''.join(f'{message.get("role")}:{message.get("content")}\n' for message in messages)
+        )
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': chunk['eval_count'],
+            'total_tokens': prompt_tokens + chunk['eval_count'],
+            'prompt_tokens_details': {'cached_tokens': max(0, prompt_tokens - chunk['prompt_eval_count'])},
+        }
+
+    async def chat_completion(self, payload: dict[str, Any]) -> dict[str, Any]:
+        """Generate a non-streaming OpenAI-compatible chat completion."""
+        messages = payload.get('messages', [])
+        content_parts = []
+        async for chunk in self.chat_generate(
+            {'messages': messages, 'options': {'num_predict': payload.get('max_tokens')}}
+        ):
+            content_parts.append(chunk['message']['content'])
+
+        return {
+            'id': 'chatcmpl-mock',
+            'object': 'chat.completion',
+            'created': 0,
+            'model': payload.get('model'),
+            'choices': [
+                {
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': ''.join(content_parts)},
+                    'finish_reason': chunk['done_reason'],
+                }
+            ],
+            'usage': self.completion_usage(messages, chunk),
+        }
+
+    async def chat_completion_stream(self, payload: dict[str, Any]) -> AsyncGenerator[str, None]:
+        """Generate OpenAI-compatible chat completion chunks as server-sent events."""
+        messages = payload.get('messages', [])
+        include_usage = (payload.get('stream_options') or {}).get('include_usage', False)
+
+        async for chunk in self.chat_generate(
+            {'messages': messages, 'options': {'num_predict': payload.get('max_tokens')}}
+        ):
+            completion_chunk: dict[str, Any] = {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion.chunk',
+                'created': 0,
+                'model': payload.get('model'),
+                'choices': [
+                    {
+                        'index': 0,
+                        'delta': {'content': chunk['message']['content']},
+                        'finish_reason': chunk.get('done_reason'),
+                    }
+                ],
+            }
+            yield f'data: {dumps(completion_chunk, ensure_ascii=False)}\n\n'
+
+            if chunk['done'] and include_usage:
+                usage_chunk = {**completion_chunk, 'choices': [], 'usage': self.completion_usage(messages, chunk)}
+                yield f'data: {dumps(usage_chunk, ensure_ascii=False)}\n\n'
+
+        yield 'data: [DONE]\n\n'
+
+
+def create_app(mock_settings: MockOllamaSettings) -> FastAPI:
+    """Create the mock Ollama application."""
+    app = FastAPI()
+    mock = MockOllama(mock_settings)
+
+    @app.get('/api/tags')
+    async def tags() -> dict[str, Any]:
+        """List available models."""
+        return {'models': [{'name': model, 'model': model} for model in mock_settings.models]}
+
+    @app.post('/api/generate', response_model=None)
+    async def generate(payload: dict[str, Any]) -> Response | dict[str, Any]:
+        """Load the model without generating, as Ollama does for an empty prompt."""
+        error = await mock.fault_inject()
+        if error:
+            return error
+        return {'model': payload.get('model'), 'response': '', 'done': True, 'done_reason': 'load'}
+
+    @app.post('/api/chat', response_model=None)
+    async def chat(payload: dict[str, Any]) -> Response | dict[str, Any]:
+        """Generate a chat completion in streaming or non-streaming mode."""
+        error = await mock.fault_inject()
+        if error:
+            return error
+
+        if payload.get('stream', True):
+            return StreamingResponse(mock.chat_stream(payload), media_type='application/x-ndjson')
+        return await mock.chat_response(payload)
+
+    @app.post('/v1/chat/completions', response_model=None)
+    async def chat_completions(payload: dict[str, Any]) -> Response | dict[str, Any]:
+        """Generate a chat completion in the OpenAI-compatible format, as Ollama does on its /v1 endpoints."""
+        error = await mock.fault_inject()
+        if error:
+            return error
+
+        if payload.get('stream', False):
+            return StreamingResponse(mock.chat_completion_stream(payload), media_type='text/event-stream')
+        return await mock.chat_completion(payload)
+
+    return app
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    mock_settings = MockOllamaSettings()
+    uvicorn.run(create_app(mock_settings), host=mock_settings.host, port=mock_settings.port)
@@ -62,6 +62,7 @@ class ChatUserModel(ChatCoreModel):
 
     id: int
     queue_position: int
+    eta: Optional[float] = None
 
 
 class ChatAdminModel(ChatUserModel):
@@ -119,4 +120,65 @@ class NNResponseModel(MessageBase):
 
     count_request_tokens: int
     count_response_tokens: int
+    count_prompt_eval_tokens: int
     role: NNRoleEnum
+    tier: int = 0
+    is_truncated: bool = False
+
+
+class NNMetricsModel(BaseModel):
+    """Aggregated inference usage counters."""
+
+    requests: int
+    prompt_tokens: int
+    prompt_eval_tokens: int
+    response_tokens: int
+    prompt_cache_hit_rate: float
+    vacancy_cache_hits: int
+    vacancy_cache_misses: int
+    greeting_pool_hits: int
+    greeting_pool_misses: int
+    degraded_requests: int
+    truncated_requests: int
+    failed_turns: int
+    cancelled_turns: int
+
+
+class NNSchedulerModel(BaseModel):
+    """Inference scheduler slots occupancy."""
+
+    concurrency: int
+    running: int
+    waiting: int
+    backlog: int
+    overflowing: int
+    wait_estimate: float
+    service_time: float
+    tier: int
+
+
+class NNWorkerModel(BaseModel):
+    """Inference worker readiness and slots occupancy."""
+
+    worker_id: str
+    is_ready: bool
+    updated_at: float
+    scheduler: NNSchedulerModel
+
+
+class NNPercentilesModel(BaseModel):
+    """Percentiles of a rolling histogram."""
+
+    count: int
+    p50: float
+    p95: float
+    p99: float
+
+
+class NNTimingsModel(BaseModel):
+    """Rolling chat turn wait and service times in seconds, and prompt and response sizes in tokens."""
+
+    wait: NNPercentilesModel
+    service: NNPercentilesModel
+    prompt_tokens: NNPercentilesModel
+    response_tokens: NNPercentilesModel
@@ -83,6 +83,22 @@ class NNRoleEnum(StrEnum):
     ASSISTANT = 'assistant'
 
 
+class NNTaskEnum(StrEnum):
+    """Defines neural network tasks which may run on different models."""
+
+    INTERVIEW = 'interview'
+    SUMMARY = 'summary'
+    VALIDATION = 'validation'
+    CONVERSION = 'conversion'
+
+
+class NNJobEnum(StrEnum):
+    """Defines kinds of queued neural network jobs."""
+
+    CHAT_INIT = 'chat_init'
+    MESSAGE_SEND = 'message_send'
+
+
 class SystemRoleEnum(StrEnum):
     """Defines access levels within the application ecosystem."""
 
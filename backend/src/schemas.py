@@ -68,6 +68,9 @@ class ChatSchema(SqlalchemyBase):
     total_count_request_tokens: Mapped[int] = mapped_column(default=0, nullable=False)
     total_count_response_tokens: Mapped[int] = mapped_column(default=0, nullable=False)
     current_count_request_tokens: Mapped[int] = mapped_column(default=0, nullable=False)
+    summary: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    summary_message_count: Mapped[int] = mapped_column(default=0, server_default='0', nullable=False)
+    num_predict: Mapped[Optional[int]] = mapped_column(nullable=True)
 
     current_event_chance: Mapped[float] = mapped_column(
         default=1.5,
@@ -97,6 +100,7 @@ class MessageSchema(SqlalchemyBase):
     role: Mapped[str] = mapped_column(SQLEnum(NNRoleEnum), nullable=False)
     content: Mapped[str] = mapped_column(String, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    tier: Mapped[Optional[int]] = mapped_column(nullable=True)
 
 
 class EventSchema(SqlalchemyBase):
@@ -72,6 +72,7 @@ async def chat_create(
     event_chance: float,
     progression_type: int,
     user_id: int,
+    num_predict: Optional[int] = None,
 ) -> ChatSchema:
     """Create a new GPT chat with optional title."""
     new_chat = ChatSchema(
@@ -79,6 +80,7 @@ async def chat_create(
         title=title,
         progression_type=progression_type,
         current_event_chance=event_chance,
+        num_predict=num_predict,
     )
 
     db.add(new_chat)
@@ -97,8 +99,10 @@ async def chat_edit(
     updated_at: Optional[datetime] = None,
     current_event_chance: Optional[float] = None,
     is_archived: Optional[bool] = None,
-    events: Optional[list[EventSchema]] = None,
+    events: Optional[list[EventSchema] | list[EventDataclass]] = None,
     title: Optional[str] = None,
+    summary: Optional[str] = None,
+    summary_message_count: Optional[int] = None,
 ) -> ChatSchema:
     """Edit GPT chat by ID."""
     request = (
@@ -126,6 +130,10 @@ async def chat_edit(
         chat.title = title
     if is_archived is not None:
         chat.is_archived = is_archived
+    if summary is not None:
+        chat.summary = summary
+    if summary_message_count is not None:
+        chat.summary_message_count = summary_message_count
 
     if events:
         event_ids = [event.id for event in events]
@@ -1,35 +1,550 @@
-from dataclasses import asdict
+import asyncio
+from contextlib import suppress
+from dataclasses import asdict, fields
 from datetime import datetime
+from hashlib import sha256
 from json import dumps, loads
+from math import ceil
 from secrets import choice
-from typing import Optional
+from time import time
+from typing import Any, AsyncGenerator, Optional
 
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import src.services.chats_services as gpt_service
-from src.config import settings
-from src.dto.chats_dto import ChatDataclass, MessageDataclass, NNQueueCellDataclass, NNQueueDataclass
-from src.engines.ollama_engine import ollama_request
+import src.utils.metrics_utils as metrics_utils
+import src.utils.workers_utils as workers_utils
+from src.config import NNConfig, settings
+from src.dto.chats_dto import (
+    ChatDataclass,
+    ChatSummaryDataclass,
+    MessageDataclass,
+    NNQueueChangeDataclass,
+    NNQueueJobDataclass,
+    VacancyCacheDataclass,
+)
+from src.engines.generally_engine import ChunkCallback, tokens_estimate
+from src.engines.inference_engine import get_inference_scheduler, inference_overflow, inference_request
 from src.engines.redis_engine import AsyncRedis
 from src.logger import Logger
-from src.models.generally_models import NNRoleEnum
+from src.models.chats_models import ChatCreateModel
+from src.models.generally_models import NNRoleEnum, NNTaskEnum, SystemRoleEnum
 from src.schemas import EventSchema
 
+VACANCY_CACHE_LRU_KEY = 'vacancy/lru'
+CHAT_JOBS_CANCEL_CHANNEL = 'jobs/cancel'
 
-async def chat_save(chat: ChatDataclass, redis: AsyncRedis):
-    """Save chat to Redis."""
-    await redis.set(
-        name=f'notifications/delete={chat.user_id}/chat:{chat.id}',
-        value='',
-        expire=30,
+QUEUE_TASKS_KEY = 'queue/tasks'
+QUEUE_OWNERS_KEY = 'queue/owners'
+QUEUE_CHATS_KEY = 'queue/chats'
+QUEUE_JOBS_KEY = 'queue/jobs'
+QUEUE_LEASES_KEY = 'queue/leases'
+QUEUE_FINISH_KEY = 'queue/finish'
+QUEUE_CHANGES_CHANNEL = 'queue/changes'
+
+QUEUE_ADD_SCRIPT = """
+if redis.call('HEXISTS', KEYS[2], ARGV[2]) == 1 then
+    return 0
+end
+local now = tonumber(ARGV[4])
+redis.call('ZREMRANGEBYSCORE', KEYS[5], '-inf', now)
+local finish = tonumber(redis.call('ZSCORE', KEYS[5], ARGV[2]) or now)
+local score = math.min(finish + tonumber(ARGV[5]), now + tonumber(ARGV[6]))
+redis.call('ZADD', KEYS[1], score, ARGV[1])
+redis.call('ZADD', KEYS[5], score, ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[1])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[4], ARGV[1], ARGV[3])
+return redis.call('ZRANK', KEYS[1], ARGV[1]) - redis.call('ZCARD', KEYS[6]) + 1
+"""
+QUEUE_REMOVE_SCRIPT = """
+local user_id = redis.call('HGET', KEYS[3], ARGV[1])
+if user_id and redis.call('HGET', KEYS[2], user_id) == ARGV[1] then
+    redis.call('HDEL', KEYS[2], user_id)
+end
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[4], ARGV[1])
+redis.call('ZREM', KEYS[5], ARGV[1])
+return redis.call('ZREM', KEYS[1], ARGV[1])
+"""
+QUEUE_CLAIM_SCRIPT = """
+local chat_ids = redis.call('ZRANGE', KEYS[1], 0, redis.call('ZCARD', KEYS[2]))
+for _, chat_id in ipairs(chat_ids) do
+    if not redis.call('ZSCORE', KEYS[2], chat_id) then
+        redis.call('ZADD', KEYS[2], ARGV[1], chat_id)
+        redis.call('ZADD', KEYS[1], '-inf', chat_id)
+        return redis.call('HGET', KEYS[3], chat_id)
+    end
+end
+return false
+"""
+QUEUE_POSITION_SCRIPT = """
+local rank = redis.call('ZRANK', KEYS[1], ARGV[1])
+if not rank then
+    return 0
+end
+if redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+    return 1
+end
+local position = rank + 1
+for _, chat_id in ipairs(redis.call('ZRANGE', KEYS[2], 0, -1)) do
+    local leased_rank = redis.call('ZRANK', KEYS[1], chat_id)
+    if leased_rank and leased_rank < rank then
+        position = position - 1
+    end
+end
+return position
+"""
+CHAT_SAVE_SCRIPT = """
+if ARGV[2] == '1' and redis.call('HEXISTS', KEYS[4], ARGV[1]) == 0 then
+    return 0
+end
+local stored_count = redis.call('LLEN', KEYS[3])
+if stored_count > tonumber(ARGV[6]) then
+    return 0
+end
+if stored_count ~= tonumber(ARGV[5]) then
+    return -1
+end
+local fields_end = 7 + 2 * tonumber(ARGV[7])
+for index = 8, fields_end, 2 do
+    redis.call('HSET', KEYS[2], ARGV[index], ARGV[index + 1])
+end
+for index = fields_end + 1, #ARGV do
+    redis.call('RPUSH', KEYS[3], ARGV[index])
+end
+redis.call('SET', KEYS[1], '', 'EX', ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+redis.call('EXPIRE', KEYS[3], ARGV[4])
+return 1
+"""
+CHAT_TRANSIENT_FIELDS = ('messages', 'queue_position', 'eta')
+
+
+def chat_key(user_id: int, chat_id: int) -> str:
+    """Get the Redis key prefix of the chat."""
+    return f'{user_id}/chat:{chat_id}'
+
+
+async def chat_save(chat: ChatDataclass, redis: AsyncRedis, is_queued: bool = False) -> bool:
+    """Save chat to Redis atomically as a small metadata hash and an append-only message list.
+
+    Messages of a chat are only ever appended, so only the messages beyond the stored ones are pushed. The save is
+    retried when another save appended messages after they were counted, and refused when Redis already holds more
+    messages than the chat, so a stale chat never overwrites newer metadata. The queue position and ETA change with
+    the queue, so they are not stored. With is_queued the chat is saved only while its task is still queued,
+    so a turn finishing after the chat was deleted does not write it back.
+    """
+    key = chat_key(user_id=chat.user_id, chat_id=chat.id)
+    metadata = [
+        item
+        for field in fields(chat)
+        if field.name not in CHAT_TRANSIENT_FIELDS
+        for item in (field.name, dumps(getattr(chat, field.name), default=asdict))
+    ]
+
+    while True:
+        stored_count = await redis.llen(f'{key}/messages')
+        is_saved: int = await redis.eval(
+            CHAT_SAVE_SCRIPT,
+            keys=[f'notifications/delete={key}', f'{key}/meta', f'{key}/messages', QUEUE_CHATS_KEY],
+            args=[
+                str(chat.id),
+                str(int(is_queued)),
+                '30',
+                '40',
+                str(stored_count),
+                str(len(chat.messages)),
+                str(len(metadata) // 2),
+                *metadata,
+                *(dumps(asdict(message)) for message in chat.messages[stored_count:]),
+            ],
+        )
+        if is_saved >= 0:
+            return bool(is_saved)
+
+
+async def chat_load_redis(
+    redis: AsyncRedis, user_id: int, chat_id: int, is_messages: bool = True
+) -> Optional[ChatDataclass]:
+    """Load chat from Redis, reading its message list only when the messages are needed.
+
+    The queue position is not stored, so it is left at 0 for chat_load to fill in.
+    """
+    key = chat_key(user_id=user_id, chat_id=chat_id)
+    metadata = await redis.hgetall(f'{key}/meta')
+    if not metadata:
+        return None
+
+    chat_dict = {name: loads(value) for name, value in metadata.items()}
+    chat_dict['queue_position'] = 0
+    chat_dict['messages'] = (
+        [loads(message) for message in await redis.lrange(f'{key}/messages', 0, -1)] if is_messages else []
     )
-    await redis.set(
-        name=f'{chat.user_id}/chat:{chat.id}',
-        value=dumps(asdict(chat)),
-        expire=40,
+
+    chat: ChatDataclass = ChatDataclass.from_dict(chat_dict)
+    return chat
+
+
+async def chat_delete_redis(redis: AsyncRedis, user_id: int, chat_id: int) -> None:
+    """Delete chat from Redis without persisting it on expiration."""
+    key = chat_key(user_id=user_id, chat_id=chat_id)
+    await redis.delete(f'notifications/delete={key}', f'{key}/meta', f'{key}/messages')
+
+
+async def chat_load(
+    db: AsyncSession, redis: AsyncRedis, user_id: int, chat_id: int, is_messages: bool = True
+) -> Optional[ChatDataclass]:
+    """Load chat from Redis or from the database, caching it in Redis with its current queue position."""
+    chat = await chat_load_redis(redis=redis, user_id=user_id, chat_id=chat_id, is_messages=is_messages)
+    if chat:
+        chat.queue_position = await queue_get_position(redis=redis, chat_id=chat_id)
+        chat.eta = await workers_utils.workers_eta_estimate(redis=redis, queue_position=chat.queue_position)
+        return chat
+
+    chat_schema = await gpt_service.chat_get(db=db, user_id=user_id, chat_id=chat_id)
+    if not chat_schema:
+        return None
+
+    chat_dataclass: ChatDataclass = ChatDataclass.from_orm(chat_schema)
+    chat_dataclass.queue_position = await queue_get_position(redis=redis, chat_id=chat_id)
+    chat_dataclass.eta = await workers_utils.workers_eta_estimate(
+        redis=redis, queue_position=chat_dataclass.queue_position
     )
 
+    await chat_delete_redis(redis=redis, user_id=user_id, chat_id=chat_id)
+    await chat_save(chat=chat_dataclass, redis=redis)
+    return chat_dataclass
+
+
+def chat_tokens_count(chat: ChatDataclass) -> int:
+    """Count prompt tokens of the chat from the last known usage plus an estimate of newer messages."""
+    last_assistant_index = -1
+    for index, message in enumerate(chat.messages):
+        if message.role == NNRoleEnum.ASSISTANT:
+            last_assistant_index = index
+
+    if last_assistant_index == -1:
+        return tokens_estimate(chat.messages)
+
+    new_messages = chat.messages[last_assistant_index + 1 :]
+    return chat.current_count_request_tokens + tokens_estimate(new_messages)
+
+
+def chat_context_head_count(chat: ChatDataclass) -> int:
+    """Count leading system messages which are always sent to the model."""
+    head_count = 0
+    for message in chat.messages:
+        if message.role != NNRoleEnum.SYSTEM:
+            break
+        head_count += 1
+
+    return head_count
+
+
+def chat_context_build(chat: ChatDataclass) -> list[MessageDataclass]:
+    """Build messages sent to the model: system prompt, running summary and the messages after it."""
+    head_count = chat_context_head_count(chat)
+    tail_start = max(head_count, chat.summary_message_count or 0)
+    context = chat.messages[:head_count]
+
+    if chat.summary:
+        context.append(
+            MessageDataclass(
+                id=None,
+                chat_id=chat.id,
+                role=NNRoleEnum.SYSTEM,
+                content=f'Краткое содержание предыдущей части собеседования:\n{chat.summary}',
+                created_at=chat.updated_at,
+            )
+        )
+
+    return context + chat.messages[tail_start:]
+
+
+def chat_summary_boundary(chat: ChatDataclass) -> Optional[int]:
+    """Find the index up to which messages should be folded into the summary.
+
+    Folding happens only when the last context exceeded the token budget and keeps the last turns untouched,
+    so the folded part moves in batches and the context between folds stays the same.
+    """
+    if chat.current_count_request_tokens <= settings.chat_context_budget:
+        return None
+
+    tail_start = max(chat_context_head_count(chat), chat.summary_message_count or 0)
+    turn_starts = [
+        index for index, message in enumerate(chat.messages) if index >= tail_start and message.role == NNRoleEnum.USER
+    ]
+
+    if len(turn_starts) <= settings.chat_context_keep_turns:
+        return None
+
+    return turn_starts[-settings.chat_context_keep_turns]
+
+
+def chat_summary_key(chat: ChatDataclass) -> str:
+    """Get the Redis key of the chat running summary."""
+    return f'{chat_key(user_id=chat.user_id, chat_id=chat.id)}/summary'
+
+
+async def chat_summary_get(chat: ChatDataclass, redis: AsyncRedis) -> ChatDataclass:
+    """Apply the latest running summary produced in the background to the chat."""
+    redis_summary = await redis.get(chat_summary_key(chat))
+    if not redis_summary:
+        return chat
+
+    summary = ChatSummaryDataclass.from_dict(loads(redis_summary))
+    if summary.summary_message_count > (chat.summary_message_count or 0):
+        chat.summary = summary.summary
+        chat.summary_message_count = summary.summary_message_count
+        chat.current_count_request_tokens = tokens_estimate(chat_context_build(chat))
+
+    return chat
+
+
+async def chat_summary_update(chat: ChatDataclass, redis: AsyncRedis, db: AsyncSession) -> None:
+    """Fold older chat messages into the running summary when the context exceeds the token budget.
+
+    The summary is generated on an inference slot of its own.
+    """
+    boundary = chat_summary_boundary(chat)
+    if boundary is None:
+        return
+
+    tail_start = max(chat_context_head_count(chat), chat.summary_message_count or 0)
+    roles = {NNRoleEnum.USER: 'Кандидат', NNRoleEnum.ASSISTANT: 'Интервьюер', NNRoleEnum.SYSTEM: 'Событие'}
+    transcript = '\n'.join(
+        f'{roles[message.role]}: {message.content}' for message in chat.messages[tail_start:boundary]
+    )
+
+    summary_prompt = (
+        'Ты ведешь краткий конспект собеседования. '
+        'Объедини предыдущий конспект и новую часть диалога в один конспект. '
+        'Сохрани заданные вопросы, суть ответов кандидата, допущенные ошибки, оценки интервьюера и события. '
+        'Пиши кратко, списком, без вступлений и пояснений.'
+    )
+    async with get_inference_scheduler().slot_acquire(chat_id=chat.id):
+        nn_response = await inference_request(
+            messages=[
+                MessageDataclass(
+                    id=None,
+                    chat_id=chat.id,
+                    role=NNRoleEnum.SYSTEM,
+                    content=summary_prompt,
+                    created_at=datetime.now().isoformat(),
+                ),
+                MessageDataclass(
+                    id=None,
+                    chat_id=chat.id,
+                    role=NNRoleEnum.USER,
+                    content=f'Предыдущий конспект:\n{chat.summary or ""}\n\nНовая часть диалога:\n{transcript}',
+                    created_at=datetime.now().isoformat(),
+                ),
+            ],
+            task=NNTaskEnum.SUMMARY,
+        )
+
+    summary = ChatSummaryDataclass(summary=nn_response.content, summary_message_count=boundary)
+    await redis.set(name=chat_summary_key(chat), value=dumps(asdict(summary)), expire=settings.redis_chat_time_live)
+    await gpt_service.chat_edit(
+        db=db, chat_id=chat.id, summary=summary.summary, summary_message_count=summary.summary_message_count
+    )
+
+
+def chat_stream_channel(chat_id: int) -> str:
+    """Get the Redis pub/sub channel name for chat streaming."""
+    return f'stream/chat:{chat_id}'
+
+
+async def chat_stream_publish(redis: AsyncRedis, chat_id: int, event: str, data: dict[str, Any]) -> None:
+    """Publish chat stream event to Redis."""
+    await redis.publish(chat_stream_channel(chat_id), dumps({'event': event, 'data': data}))
+
+
+def chat_stream_publisher(redis: AsyncRedis, chat_id: int) -> ChunkCallback:
+    """Create callback which publishes generated tokens of the chat."""
+
+    async def publish_token(content: str) -> None:
+        await chat_stream_publish(redis=redis, chat_id=chat_id, event='token', data={'content': content})
+
+    return publish_token
+
+
+def chat_stream_format(event: str, data: dict[str, Any]) -> str:
+    """Format event as Server-Sent Events message."""
+    return f'event: {event}\ndata: {dumps(data, ensure_ascii=False)}\n\n'
+
+
+async def chat_stream_listen(redis: AsyncRedis, chat: ChatDataclass) -> AsyncGenerator[str, None]:
+    """Listen chat stream events from Redis and yield them as Server-Sent Events until generation is done.
+
+    A turn leaves the queue before its done event is published, so a client subscribing in between finds
+    the chat out of the queue and gets the saved last message instead.
+    """
+    pubsub = redis.pubsub()
+    await pubsub.subscribe(chat_stream_channel(chat.id))
+
+    try:
+        if await queue_get_position(redis=redis, chat_id=chat.id) == 0:
+            redis_message = await redis.lindex(f'{chat_key(user_id=chat.user_id, chat_id=chat.id)}/messages', -1)
+            yield chat_stream_format(event='done', data=loads(redis_message) if redis_message else {})
+            return
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=settings.chat_stream_heartbeat)
+            if message is None:
+                yield ': ping\n\n'
+                continue
+
+            payload = loads(message['data'])
+            yield chat_stream_format(event=payload['event'], data=payload['data'])
+
+            if payload['event'] in ('done', 'cancelled', 'error'):
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()  # type: ignore[no-untyped-call]
+
+
+def chat_queue_event(queue_position: int, eta: Optional[float]) -> str:
+    """Format the queue position of the chat and its estimated time to finish as Server-Sent Events message."""
+    return chat_stream_format(event='queue', data={'queue_position': queue_position, 'eta': eta})
+
+
+async def chat_events_listen(redis: AsyncRedis, chat: ChatDataclass) -> AsyncGenerator[str, None]:
+    """Listen queue position changes and generation events of the chat and yield them as Server-Sent Events.
+
+    Unlike the generation stream it stays open across turns, so clients never poll the chat.
+    Queue changes are broadcast once for all chats with the worker capacity, so a listener looks up only its own
+    position, and only while its chat is queued or when the change is about its chat.
+    """
+    pubsub = redis.pubsub()
+    await pubsub.subscribe(chat_stream_channel(chat.id), QUEUE_CHANGES_CHANNEL)
+
+    try:
+        queue_position = await queue_get_position(redis=redis, chat_id=chat.id)
+        eta = await workers_utils.workers_eta_estimate(redis=redis, queue_position=queue_position)
+        yield chat_queue_event(queue_position=queue_position, eta=eta)
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=settings.chat_stream_heartbeat)
+            if message is None:
+                yield ': ping\n\n'
+                continue
+
+            if message['channel'] == QUEUE_CHANGES_CHANNEL:
+                change: NNQueueChangeDataclass = NNQueueChangeDataclass.from_dict(loads(message['data']))
+                if not queue_position and change.chat_id != chat.id:
+                    continue
+
+                new_queue_position = await queue_get_position(redis=redis, chat_id=chat.id)
+                if new_queue_position != queue_position:
+                    queue_position = new_queue_position
+                    eta = workers_utils.workers_eta_calculate(
+                        queue_position=queue_position, concurrency=change.concurrency, service_time=change.service_time
+                    )
+                    yield chat_queue_event(queue_position=queue_position, eta=eta)
+                continue
+
+            payload = loads(message['data'])
+            yield chat_stream_format(event=payload['event'], data=payload['data'])
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()  # type: ignore[no-untyped-call]
+
+
+async def chat_job_cancel(redis: AsyncRedis, chat_id: int) -> None:
+    """Cancel the queued or running job of the chat in every worker and end its stream."""
+    await redis.publish(CHAT_JOBS_CANCEL_CHANNEL, str(chat_id))
+    await chat_stream_publish(redis=redis, chat_id=chat_id, event='cancelled', data={})
+
+
+async def chat_job_fail(redis: AsyncRedis, chat_id: int) -> None:
+    """Release the queue position of a failed chat job and end its stream with an error."""
+    await queue_remove_task(redis=redis, chat_id=chat_id)
+    await chat_stream_publish(redis=redis, chat_id=chat_id, event='error', data={'detail': 'Generation failed'})
+
+
+async def chat_job_cancel_listen(redis: AsyncRedis) -> None:
+    """Listen for chat job cancellations published by API processes."""
+    pubsub = redis.pubsub()
+    await pubsub.subscribe(CHAT_JOBS_CANCEL_CHANNEL)
+
+    try:
+        async for message in pubsub.listen():
+            if message['type'] == 'message':
+                get_inference_scheduler().job_cancel(int(message['data']))
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()  # type: ignore[no-untyped-call]
+
+
+def system_prompt_build(create_chat_data: ChatCreateModel) -> str:
+    """Build the interviewer system prompt.
+
+    The prompt depends only on the persona settings and keeps the fixed rules first,
+    so chats share the longest possible prefix in the Ollama prompt cache.
+    """
+    return (
+        'Ты — живой интервьюер с уникальной личностью, проводящий собеседование. '
+        'Критически важно соблюдать естественный диалоговый ритм:\n\n'
+        'ЖЕСТКИЕ ПРАВИЛА ДИАЛОГА:\n'
+        '1. Первое сообщение: ТОЛЬКО приветствие и представление (1-2 предложения)\n'
+        "   Пример: 'Привет! Я Алексей, senior-разработчик. Рад видеть тебя на собеседовании.'\n"
+        '2. После приветствия ОБЯЗАТЕЛЬНО ДОЖДИСЬ ответа кандидата\n'
+        '3. Только после ответа задай ПЕРВЫЙ вопрос\n'
+        '4. Всегда задавай строго по одному вопросу за реплику\n'
+        '5. Между вопросами ВСЕГДА жди ответа пользователя\n'
+        '6. Реплики должны быть краткими (1-2 предложения максимум)\n\n'
+        'ТЕХНИКИ ЕСТЕСТВЕННОГО ПОВЕДЕНИЯ:\n'
+        '- После ответа кандидата делай микропаузу (0.5-2 сек)\n'
+        "- Используй подтверждающие реплики ('Понял', 'Интересно', 'Ясно')\n"
+        '- Задавай уточняющие вопросы по ответам\n'
+        "- Проявляй эмоциональные реакции ('О, необычный подход!', 'Вот это интересно!')\n"
+        "- Допускай естественные паузы обдумывания (используй фразы типа '{random.choice(SPONTANEITY_CONFIG['thinking_phrases'])}')\n"
+        "- В 10% случаев добавляй личные комментарии: '{random.choice(SPONTANEITY_CONFIG['personal_comments'])}'\n"
+        "- В 15% вопросов используй спонтанные уточнения: '{random.choice(SPONTANEITY_CONFIG['follow_up_questions'])}'\n"
+        "- В 5% случаев допускай вежливые прерывания: '{random.choice(SPONTANEITY_CONFIG['natural_interruptions'])}'\n\n"
+        'СТРУКТУРА СОБЕСЕДОВАНИЯ:\n'
+        '1. Приветствие (только в первом сообщении)\n'
+        '2. Легкий разогревочный вопрос\n'
+        '3. Технические вопросы по вакансии\n'
+        '4. Поведенческие вопросы\n'
+        '5. Вопросы кандидату\n\n'
+        'ЗАПРЕЩЕНО:\n'
+        '- Задавать несколько вопросов подряд\n'
+        '- Продолжать без ответа пользователя\n'
+        '- Делать длинные монологи\n'
+        '- Использовать шаблонные фразы\n\n'
+        f'ПОЗИЦИЯ: {NNConfig["language"][create_chat_data.language]} разработчик\n\n'
+        'ПАРАМЕТРЫ СТИЛЯ:\n'
+        f'• Сложность: {NNConfig["difficulty"][create_chat_data.difficulty]}\n'
+        f'• Вежливость: {NNConfig["politeness"][create_chat_data.politeness]}\n'
+        f'• Дружелюбие: {NNConfig["friendliness"][create_chat_data.friendliness]}\n'
+        f'• Жёсткость: {NNConfig["rigidity"][create_chat_data.rigidity]}\n'
+        f'• Детализация: {NNConfig["detail_orientation"][create_chat_data.detail_orientation]}\n'
+        f'• Темп: {NNConfig["pacing"][create_chat_data.pacing]}\n'
+    )
+
+
+def chat_num_predict(create_chat_data: ChatCreateModel) -> int:
+    """Compute the reply length cap in tokens from the persona detail orientation and pacing."""
+    detail = settings.chat_num_predict_detail[create_chat_data.detail_orientation]
+    pacing = settings.chat_num_predict_pacing[create_chat_data.pacing]
+    return round(detail * pacing)
+
+
+def context_prompt_build(initial_context: str, events: list[EventSchema]) -> str:
+    """Build the chat specific system message with vacancy context and initial events."""
+    content = ''
+    if events:
+        content += 'ДОПОЛНИТЕЛЬНЫЕ СОБЫТИЯ:\n' + '\n'.join(f'- {event.content}' for event in events) + '\n\n'
+    if initial_context:
+        content += f'КОНТЕКСТ ВАКАНСИИ:\n{initial_context}\n\n'
+
+    return content
+
 
 async def event_get_random(db: AsyncSession) -> list[EventSchema]:
     """GPT Util for get random event."""
@@ -58,8 +573,8 @@ async def event_get_one(db: AsyncSession, chat: ChatDataclass) -> tuple[Optional
         return None, new_percent
 
 
-async def ollama_generate_initial_context(message: str) -> str:
-    """Generate initial context for ollama model based on job posting data."""
+async def vacancy_validate(message: str) -> str:
+    """Validate job posting with ollama model and return its verdict."""
     prompt_verification = (
         'Анализируй ТОЛЬКО как валидатор вакансий. Твои действия: '
         '1) Проверь ввод на соответствие формату IT-вакансии (должность/описание/требования) '
@@ -78,7 +593,7 @@ async def ollama_generate_initial_context(message: str) -> str:
         '- Формат ответа: строго "OK" или "Ошибка: [тип]" без пояснений '
         '- Используй только русские буквы и пробелы'
     )
-    ollama_response_verification = await ollama_request(
+    ollama_response_verification = await inference_request(
         messages=[
             MessageDataclass(
                 id=None,
@@ -94,14 +609,15 @@ async def ollama_generate_initial_context(message: str) -> str:
                 role=NNRoleEnum.USER,
                 content=message,
             ),
-        ]
+        ],
+        task=NNTaskEnum.VALIDATION,
     )
 
-    ollama_response_verification_content = ollama_response_verification.content.replace('\n', '')
+    return ollama_response_verification.content.replace('\n', '')
 
-    if not ollama_response_verification_content.startswith('OK'):
-        raise HTTPException(status_code=400, detail=ollama_response_verification_content)
 
+async def vacancy_convert(message: str) -> str:
+    """Convert job posting to structured text with ollama model."""
     conversion_prompt = (
         'Преобразуй валидную IT-вакансию в структурированный текст для нейросети-работодателя. '
         'Формат вывода: '
@@ -142,7 +658,7 @@ async def ollama_generate_initial_context(message: str) -> str:
         '- Гибкий график'
     )
 
-    ollama_response_conversion = await ollama_request(
+    ollama_response_conversion = await inference_request(
         messages=[
             MessageDataclass(
                 id=None,
@@ -158,75 +674,234 @@ async def ollama_generate_initial_context(message: str) -> str:
                 content=message,
                 created_at=datetime.now().isoformat(),
             ),
-        ]
+        ],
+        task=NNTaskEnum.CONVERSION,
     )
 
     return ollama_response_conversion.content
 
 
-async def queue_get(redis: AsyncRedis) -> NNQueueDataclass:
-    """Get queue count from redis."""
-    redis_queue = await redis.get('queue')
+def vacancy_cache_key(message: str) -> str:
+    """Get the Redis cache key of the job posting by its normalized text."""
+    normalized_message = ' '.join(message.split()).casefold()
+    return f'vacancy/{sha256(normalized_message.encode("utf-8")).hexdigest()}'
+
+
+async def vacancy_cache_get(redis: AsyncRedis, message: str) -> Optional[VacancyCacheDataclass]:
+    """Get cached validation verdict and converted text of the job posting."""
+    key = vacancy_cache_key(message)
+    redis_vacancy = await redis.get(key)
+    if not redis_vacancy:
+        return None
+
+    await redis.zadd(VACANCY_CACHE_LRU_KEY, {key: time()})
+    await redis.expire(key, settings.vacancy_cache_time_live)
+
+    vacancy: VacancyCacheDataclass = VacancyCacheDataclass.from_dict(loads(redis_vacancy))
+    return vacancy
+
+
+async def vacancy_cache_set(redis: AsyncRedis, message: str, vacancy: VacancyCacheDataclass) -> None:
+    """Cache validation verdict and converted text of the job posting, evicting least recently used entries."""
+    key = vacancy_cache_key(message)
+    await redis.set(name=key, value=dumps(asdict(vacancy)), expire=settings.vacancy_cache_time_live)
+    await redis.zadd(VACANCY_CACHE_LRU_KEY, {key: time()})
+
+    overflow = await redis.zcard(VACANCY_CACHE_LRU_KEY) - settings.vacancy_cache_max_size
+    if overflow > 0:
+        evicted = await redis.zpopmin(VACANCY_CACHE_LRU_KEY, overflow)
+        await redis.delete(*(evicted_key for evicted_key, _ in evicted))
+
+
+async def vacancy_process(message: str, chat_id: int) -> tuple[str, str]:
+    """Validate and convert job posting, starting the conversion speculatively alongside the validation.
+
+    The speculative conversion needs an inference slot of its own, so it starts only when the job overflows to
+    the secondary engine or a second slot is free at once. Otherwise the posting is converted after its validation.
+    The conversion is cancelled as soon as the validation rejects the posting.
+    """
+    scheduler = get_inference_scheduler()
+    is_overflowing = inference_overflow.get()
+    if not is_overflowing and not scheduler.slot_try_take(chat_id):
+        verdict = await vacancy_validate(message)
+        return verdict, await vacancy_convert(message) if verdict.startswith('OK') else ''
+
+    conversion_task = asyncio.create_task(vacancy_convert(message))
+    try:
+        verdict = await vacancy_validate(message)
+        if not verdict.startswith('OK'):
+            return verdict, ''
+
+        return verdict, await conversion_task
+    finally:
+        conversion_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await conversion_task
+        if not is_overflowing:
+            scheduler.slot_release(chat_id)
+
+
+async def ollama_generate_initial_context(message: str, chat_id: int, redis: AsyncRedis) -> str:
+    """Generate initial context for ollama model based on job posting data.
 
-    if redis_queue is None:
-        queue = NNQueueDataclass(cells=[])
-        await redis.set('queue', dumps(asdict(queue)))
-        return queue
+    Verdicts and converted texts are cached by the normalized posting, so repeated postings skip both model calls.
+    """
+    vacancy = await vacancy_cache_get(redis=redis, message=message)
 
-    redis_queue = NNQueueDataclass.from_dict(loads(redis_queue))
-    return redis_queue
+    if vacancy is None:
+        await metrics_utils.metrics_increment(redis=redis, vacancy_cache_misses=1)
+
+        verdict, content = await vacancy_process(message=message, chat_id=chat_id)
+        vacancy = VacancyCacheDataclass(verdict=verdict, content=content)
+
+        await vacancy_cache_set(redis=redis, message=message, vacancy=vacancy)
+    else:
+        await metrics_utils.metrics_increment(redis=redis, vacancy_cache_hits=1)
+
+    if not vacancy.verdict.startswith('OK'):
+        raise HTTPException(status_code=400, detail=vacancy.verdict)
+
+    return vacancy.content
 
 
 async def queue_get_position(redis: AsyncRedis, chat_id: int) -> int:
-    """Get queue position from redis."""
-    queue = await queue_get(redis=redis)
+    """Get queue position from redis, counting only the tasks not yet claimed by a consumer.
+
+    A claimed task is being generated and reports position 1.
+    """
+    position: int = await redis.eval(
+        QUEUE_POSITION_SCRIPT, keys=[QUEUE_TASKS_KEY, QUEUE_LEASES_KEY], args=[str(chat_id)]
+    )
+    return position
 
-    for cell_index in range(len(queue.cells)):
-        cell = queue.cells[cell_index]
-        if cell.chat_id == chat_id:
-            return cell_index + 1
 
-    return 0
+async def queue_has_task(redis: AsyncRedis, chat_id: int) -> bool:
+    """Check whether the chat task is still queued or running."""
+    return await redis.hexists(QUEUE_CHATS_KEY, str(chat_id))
+
+
+async def queue_get_length(redis: AsyncRedis) -> int:
+    """Get the number of queued and running tasks."""
+    return await redis.zcard(QUEUE_TASKS_KEY)
 
 
 async def queue_get_count_tasks(redis: AsyncRedis, user_id: int) -> int:
     """Get queue count from redis."""
-    queue = await queue_get(redis=redis)
+    return int(await redis.hexists(QUEUE_OWNERS_KEY, str(user_id)))
 
-    return len([cell for cell in queue.cells if cell.user_id == user_id])
 
+async def queue_get_backlog(redis: AsyncRedis) -> int:
+    """Get the number of queued tasks not claimed by any consumer."""
+    return max(0, await queue_get_length(redis=redis) - await redis.zcard(QUEUE_LEASES_KEY))
 
-async def queue_add_task(redis: AsyncRedis, user_id: int, chat_id: int) -> int:
-    """Add task to queue in redis."""
-    queue = await queue_get(redis=redis)
 
-    for cell in queue.cells:
-        if cell.user_id == user_id:
-            raise Logger.create_response_error(error_key='access_denied', is_cookie_remove=False)
+def queue_task_cost(job: NNQueueJobDataclass) -> float:
+    """Estimate the turn cost in seconds from its prompt tokens, scaled down by the weight of the user role."""
+    cost = settings.queue_turn_cost + job.count_tokens * settings.queue_token_cost
+    return cost / settings.queue_role_weights.get(job.role, 1.0)
 
-    queue.cells.append(NNQueueCellDataclass(chat_id=chat_id, user_id=user_id))
-    await redis.set('queue', dumps(asdict(queue)))
 
-    return len(queue.cells)
+async def queue_admit(redis: AsyncRedis, role: SystemRoleEnum) -> None:
+    """Refuse a new turn when its predicted queue wait exceeds the limit of the user role.
 
+    The refusal carries a Retry-After of the time the backlog needs to drain below the limit.
+    """
+    max_wait = settings.queue_admission_max_waits.get(role)
+    if max_wait is None:
+        return
 
-async def queue_remove_task(redis: AsyncRedis) -> NNQueueDataclass:
-    """Remove task from queue in redis."""
-    queue = await queue_get(redis=redis)
-    queue.cells.pop(0)
+    wait = await workers_utils.workers_wait_estimate(redis=redis, queue_length=await queue_get_length(redis=redis))
+    if wait is None or wait <= max_wait:
+        return
 
-    for cell_index in range(len(queue.cells)):
-        cell = queue.cells[cell_index]
-        chat_redis = await redis.get(value=f'{cell.user_id}/chat:{cell.chat_id}')
-        if not chat_redis:
-            continue
+    raise Logger.create_response_error(
+        error_key='queue_overloaded', headers={'Retry-After': str(max(1, ceil(wait - max_wait)))}
+    )
 
-        chat = loads(chat_redis)
-        chat['queue_position'] = cell_index + 1
 
-        await redis.set(
-            name=f'{cell.user_id}/chat:{cell.chat_id}', value=dumps(chat), expire=settings.redis_chat_time_live
-        )
+async def queue_add_task(redis: AsyncRedis, job: NNQueueJobDataclass) -> int:
+    """Add task to queue in redis in weighted fair order, stamping its enqueue time.
+
+    A task is ordered by the virtual finish time of its user: the later of now and the finish of the user's
+    previous task, plus the task cost. The order is capped at now plus the maximum delay, so waiting tasks age
+    and no task is overtaken by newer ones after waiting that long.
+    """
+    job.enqueued_at = time()
+    position: int = await redis.eval(
+        QUEUE_ADD_SCRIPT,
+        keys=[
+            QUEUE_TASKS_KEY,
+            QUEUE_OWNERS_KEY,
+            QUEUE_CHATS_KEY,
+            QUEUE_JOBS_KEY,
+            QUEUE_FINISH_KEY,
+            QUEUE_LEASES_KEY,
+        ],
+        args=[
+            str(job.chat_id),
+            str(job.user_id),
+            dumps(asdict(job)),
+            str(job.enqueued_at),
+            str(queue_task_cost(job)),
+            str(settings.queue_max_delay),
+        ],
+    )
+    if not position:
+        raise Logger.create_response_error(error_key='access_denied', is_cookie_remove=False)
+
+    await queue_change_publish(redis=redis, chat_id=job.chat_id)
+    return position
+
+
+async def queue_remove_task(redis: AsyncRedis, chat_id: int) -> bool:
+    """Remove chat task from queue in redis.
+
+    Jobs run on several inference slots finish out of order, so the task is removed by chat ID.
+    """
+    is_removed: int = await redis.eval(
+        QUEUE_REMOVE_SCRIPT,
+        keys=[QUEUE_TASKS_KEY, QUEUE_OWNERS_KEY, QUEUE_CHATS_KEY, QUEUE_JOBS_KEY, QUEUE_LEASES_KEY],
+        args=[str(chat_id)],
+    )
+    if is_removed:
+        await queue_change_publish(redis=redis, chat_id=chat_id)
+
+    return bool(is_removed)
+
+
+async def queue_change_publish(redis: AsyncRedis, chat_id: int) -> None:
+    """Broadcast a change of the chat task with the worker capacity, read once for all listeners."""
+    concurrency, service_time = await workers_utils.workers_capacity_get(redis=redis)
+    change = NNQueueChangeDataclass(chat_id=chat_id, concurrency=concurrency, service_time=service_time)
+    await redis.publish(QUEUE_CHANGES_CHANNEL, dumps(asdict(change)))
+
+
+async def queue_claim_task(redis: AsyncRedis) -> Optional[NNQueueJobDataclass]:
+    """Claim the first queued task not leased by another consumer, leasing it for the lease time.
+
+    The claimed task is pinned to the front of the queue, so later arrivals never rank ahead of running turns.
+    Claiming moves the waiting tasks up, so the change is broadcast as well.
+    """
+    redis_job: Optional[str] = await redis.eval(
+        QUEUE_CLAIM_SCRIPT,
+        keys=[QUEUE_TASKS_KEY, QUEUE_LEASES_KEY, QUEUE_JOBS_KEY],
+        args=[str(time() + settings.queue_lease_time)],
+    )
+    if redis_job is None:
+        return None
+
+    job: NNQueueJobDataclass = NNQueueJobDataclass.from_dict(loads(redis_job))
+    await queue_change_publish(redis=redis, chat_id=job.chat_id)
+    return job
+
+
+async def queue_lease_renew(redis: AsyncRedis, chat_ids: list[int]) -> None:
+    """Extend the leases of tasks still running in this consumer and release expired leases of others.
+
+    Tasks whose consumer stopped without finishing them become claimable again once their lease expires.
+    """
+    if chat_ids:
+        deadline = time() + settings.queue_lease_time
+        await redis.zadd(QUEUE_LEASES_KEY, {str(chat_id): deadline for chat_id in chat_ids}, xx=True)
 
-    await redis.set('queue', dumps(asdict(queue)))
-    return queue
+    await redis.zremrangebyscore(QUEUE_LEASES_KEY, '-inf', time())
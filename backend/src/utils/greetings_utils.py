@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime
+from hashlib import sha256
+from json import dumps, loads
+from typing import Optional
+
+import src.utils.metrics_utils as metrics_utils
+from src.config import settings
+from src.dto.chats_dto import MessageDataclass
+from src.engines.inference_engine import get_inference_scheduler, inference_request
+from src.engines.redis_engine import AsyncRedis
+from src.models.chats_models import ChatCreateModel, NNResponseModel
+from src.models.generally_models import NNRoleEnum
+from src.utils.chats_utils import chat_num_predict, system_prompt_build
+
+GREETINGS_DEMAND_KEY = 'greetings/demand'
+GREETING_PERSONA_FIELDS = {
+    'difficulty',
+    'politeness',
+    'friendliness',
+    'rigidity',
+    'detail_orientation',
+    'pacing',
+    'language',
+}
+GREETING_JOB_ID = 0
+
+
+def greeting_persona(create_chat_data: ChatCreateModel) -> str:
+    """Serialize the persona settings the system prompt depends on."""
+    return dumps(create_chat_data.model_dump(include=GREETING_PERSONA_FIELDS), sort_keys=True)
+
+
+def greeting_pool_key(system_prompt: str) -> str:
+    """Build greeting pool key in Redis, so an edited system prompt starts a new pool."""
+    return f'greetings/{sha256(system_prompt.encode()).hexdigest()}'
+
+
+async def greeting_pool_take(redis: AsyncRedis, create_chat_data: ChatCreateModel) -> Optional[NNResponseModel]:
+    """Take a pre-generated greeting for the persona and record the demand for it."""
+    await redis.zincrby(GREETINGS_DEMAND_KEY, 1, greeting_persona(create_chat_data))
+    greeting = await redis.lpop(greeting_pool_key(system_prompt_build(create_chat_data=create_chat_data)))
+
+    if greeting is None:
+        await metrics_utils.metrics_increment(redis=redis, greeting_pool_misses=1)
+        return None
+
+    await metrics_utils.metrics_increment(redis=redis, greeting_pool_hits=1)
+    return NNResponseModel.model_validate_json(greeting)
+
+
+async def greeting_generate(redis: AsyncRedis, persona: str) -> None:
+    """Generate one greeting for the persona and add it to its pool."""
+    create_chat_data = ChatCreateModel.model_construct(**loads(persona))
+    system_prompt = system_prompt_build(create_chat_data=create_chat_data)
+    nn_response = await inference_request(
+        messages=[
+            MessageDataclass(
+                id=None,
+                chat_id=GREETING_JOB_ID,
+                role=NNRoleEnum.SYSTEM,
+                content=system_prompt,
+                created_at=datetime.now().isoformat(),
+            )
+        ],
+        num_predict=chat_num_predict(create_chat_data=create_chat_data),
+    )
+    await metrics_utils.metrics_nn_response_record(redis=redis, nn_response=nn_response)
+
+    key = greeting_pool_key(system_prompt)
+    await redis.rpush(key, nn_response.model_dump_json())
+    await redis.expire(key, settings.greeting_pool_time_live)
+
+
+async def greeting_pool_fill_loop(redis: AsyncRedis) -> None:
+    """Fill greeting pools of the most demanded personas while inference slots are idle."""
+    scheduler = get_inference_scheduler()
+
+    while True:
+        await asyncio.sleep(settings.greeting_pool_interval)
+        personas = await redis.zrevrange(GREETINGS_DEMAND_KEY, 0, settings.greeting_pool_personas - 1)
+
+        for persona in personas:
+            occupancy = scheduler.occupancy()
+            if occupancy.running or occupancy.waiting or occupancy.backlog:
+                break
+
+            system_prompt = system_prompt_build(create_chat_data=ChatCreateModel.model_construct(**loads(persona)))
+            if await redis.llen(greeting_pool_key(system_prompt)) >= settings.greeting_pool_size:
+                continue
+
+            try:
+                async with scheduler.slot_acquire(chat_id=GREETING_JOB_ID):
+                    await greeting_generate(redis=redis, persona=persona)
+            except Exception as e:
+                print(f'Error generating greeting: {e}')
@@ -0,0 +1,179 @@
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+from math import ceil, log
+from time import time
+from typing import AsyncIterator, Optional
+
+from src.config import settings
+from src.dto.chats_dto import NNMetricsDataclass, NNPercentilesDataclass, NNTimingsDataclass, NNTurnDataclass
+from src.engines.redis_engine import AsyncRedis
+from src.models.chats_models import NNResponseModel
+
+METRICS_KEY = 'metrics'
+METRICS_HISTOGRAM_KEY = 'metrics/histogram'
+METRICS_SERVICE_TIME_KEY = 'metrics/service_time'
+HISTOGRAM_BASE = 0.01
+HISTOGRAM_RATIO = 2**0.25
+
+
+async def metrics_increment(redis: AsyncRedis, **counters: int) -> None:
+    """Increment metrics counters in Redis."""
+    for name, amount in counters.items():
+        await redis.hincrby(METRICS_KEY, name, amount)
+
+
+async def metrics_nn_response_record(redis: AsyncRedis, nn_response: NNResponseModel) -> None:
+    """Record token usage of a model response."""
+    await metrics_increment(
+        redis=redis,
+        requests=1,
+        prompt_tokens=nn_response.count_request_tokens,
+        prompt_eval_tokens=nn_response.count_prompt_eval_tokens,
+        response_tokens=nn_response.count_response_tokens,
+        degraded_requests=int(nn_response.tier > 0),
+        truncated_requests=int(nn_response.is_truncated),
+    )
+
+
+async def metrics_get(redis: AsyncRedis) -> NNMetricsDataclass:
+    """Get metrics counters from Redis."""
+    counters = {name: int(value) for name, value in (await redis.hgetall(METRICS_KEY)).items()}
+
+    prompt_tokens = counters.get('prompt_tokens', 0)
+    prompt_eval_tokens = counters.get('prompt_eval_tokens', 0)
+    prompt_cache_hit_rate = max(0.0, 1 - prompt_eval_tokens / prompt_tokens) if prompt_tokens else 0.0
+
+    return NNMetricsDataclass(
+        requests=counters.get('requests', 0),
+        prompt_tokens=prompt_tokens,
+        prompt_eval_tokens=prompt_eval_tokens,
+        response_tokens=counters.get('response_tokens', 0),
+        prompt_cache_hit_rate=prompt_cache_hit_rate,
+        vacancy_cache_hits=counters.get('vacancy_cache_hits', 0),
+        vacancy_cache_misses=counters.get('vacancy_cache_misses', 0),
+        greeting_pool_hits=counters.get('greeting_pool_hits', 0),
+        greeting_pool_misses=counters.get('greeting_pool_misses', 0),
+        degraded_requests=counters.get('degraded_requests', 0),
+        truncated_requests=counters.get('truncated_requests', 0),
+        failed_turns=counters.get('failed_turns', 0),
+        cancelled_turns=counters.get('cancelled_turns', 0),
+    )
+
+
+def histogram_bucket(value: float) -> int:
+    """Get the histogram bucket of the value, bucket bounds growing geometrically from the base."""
+    if value <= HISTOGRAM_BASE:
+        return 0
+    return ceil(log(value / HISTOGRAM_BASE, HISTOGRAM_RATIO))
+
+
+def histogram_percentile(buckets: Counter[int], percentile: float) -> float:
+    """Get the percentile of the histogram as the upper bound of the bucket it falls in."""
+    rank = percentile * buckets.total()
+    cumulative = 0
+    for bucket in sorted(buckets):
+        cumulative += buckets[bucket]
+        if cumulative >= rank:
+            return round(HISTOGRAM_BASE * HISTOGRAM_RATIO**bucket, 2)
+    return 0.0
+
+
+async def metrics_histogram_record(redis: AsyncRedis, **values: float) -> None:
+    """Record values in rolling histograms in Redis, sliced by time so old slices expire."""
+    histogram_slice = int(time() // settings.metrics_histogram_slice)
+    for name, value in values.items():
+        key = f'{METRICS_HISTOGRAM_KEY}/{name}:{histogram_slice}'
+        await redis.hincrby(key, str(histogram_bucket(value)))
+        await redis.expire(key, settings.metrics_histogram_window + settings.metrics_histogram_slice)
+
+
+async def metrics_histogram_get(redis: AsyncRedis, name: str) -> NNPercentilesDataclass:
+    """Get percentiles of the rolling histogram over the histogram window."""
+    current_slice = int(time() // settings.metrics_histogram_slice)
+    slices_count = settings.metrics_histogram_window // settings.metrics_histogram_slice
+
+    buckets: Counter[int] = Counter()
+    for histogram_slice in range(current_slice - slices_count + 1, current_slice + 1):
+        redis_buckets = await redis.hgetall(f'{METRICS_HISTOGRAM_KEY}/{name}:{histogram_slice}')
+        buckets.update({int(bucket): int(count) for bucket, count in redis_buckets.items()})
+
+    return NNPercentilesDataclass(
+        count=buckets.total(),
+        p50=histogram_percentile(buckets, 0.5),
+        p95=histogram_percentile(buckets, 0.95),
+        p99=histogram_percentile(buckets, 0.99),
+    )
+
+
+async def metrics_service_time_compute(redis: AsyncRedis) -> str:
+    """Compute the median chat turn service time over the histogram window, 0 when no turn was recorded."""
+    service = await metrics_histogram_get(redis=redis, name='service')
+    return str(service.p50 if service.count else 0.0)
+
+
+async def metrics_service_time_refresh(redis: AsyncRedis) -> None:
+    """Cache the median chat turn service time for a histogram slice unless it is already cached."""
+    if await redis.get(METRICS_SERVICE_TIME_KEY) is None:
+        await redis.set(
+            name=METRICS_SERVICE_TIME_KEY,
+            value=await metrics_service_time_compute(redis=redis),
+            expire=settings.metrics_histogram_slice,
+        )
+
+
+async def metrics_service_time_get(redis: AsyncRedis) -> Optional[float]:
+    """Get the median chat turn service time over the histogram window, or None when no turn was recorded.
+
+    Workers keep the median cached, so estimates do not read the whole window every time and write nothing.
+    """
+    cached_service_time = await redis.get(METRICS_SERVICE_TIME_KEY)
+    if cached_service_time is None:
+        cached_service_time = await metrics_service_time_compute(redis=redis)
+
+    return float(cached_service_time) or None
+
+
+@asynccontextmanager
+async def metrics_turn_measure(
+    redis: AsyncRedis, enqueued_at: Optional[float], is_inference: bool = True
+) -> AsyncIterator[NNTurnDataclass]:
+    """Measure a chat turn from entering the context, recording its timings and token counts on exit.
+
+    The queue wait is recorded for every turn, and jobs enqueued without an enqueue time record no wait.
+    Service time and token counts are recorded for completed turns only, failed and cancelled turns are counted.
+    Turns served without inference record only their wait, so they do not shorten the service time estimates.
+    """
+    started_at = time()
+    if enqueued_at is not None:
+        await metrics_histogram_record(redis=redis, wait=started_at - enqueued_at)
+
+    turn = NNTurnDataclass()
+    try:
+        yield turn
+    except asyncio.CancelledError:
+        await metrics_increment(redis=redis, cancelled_turns=1)
+        raise
+    except Exception:
+        await metrics_increment(redis=redis, failed_turns=1)
+        raise
+
+    if not is_inference:
+        return
+
+    await metrics_histogram_record(
+        redis=redis,
+        service=time() - started_at,
+        prompt_tokens=turn.prompt_tokens,
+        response_tokens=turn.response_tokens,
+    )
+
+
+async def metrics_timings_get(redis: AsyncRedis) -> NNTimingsDataclass:
+    """Get percentiles of chat turn timings and sizes over the histogram window."""
+    return NNTimingsDataclass(
+        wait=await metrics_histogram_get(redis=redis, name='wait'),
+        service=await metrics_histogram_get(redis=redis, name='service'),
+        prompt_tokens=await metrics_histogram_get(redis=redis, name='prompt_tokens'),
+        response_tokens=await metrics_histogram_get(redis=redis, name='response_tokens'),
+    )
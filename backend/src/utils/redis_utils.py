@@ -1,12 +1,13 @@
 from datetime import datetime
-from json import loads
 
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 import src.services.chats_services as gpt_service
+import src.utils.chats_utils as chats_utils
 from src.dto.chats_dto import ChatDataclass, MessageDataclass
 from src.engines.database_engine import session_factory
+from src.engines.redis_engine import AsyncRedis
 from src.schemas import MessageSchema
 
 
@@ -23,6 +24,7 @@ async def save_messages(chat: ChatDataclass, db: AsyncSession) -> ChatDataclass:
                     content=message.content,
                     role=message.role,
                     chat_id=chat.id,
+                    tier=message.tier,
                 )
             )
             indexes.append(i)
@@ -40,6 +42,7 @@ async def save_messages(chat: ChatDataclass, db: AsyncSession) -> ChatDataclass:
             created_at=new_msg.created_at,
             content=new_msg.content,
             role=new_msg.role,
+            tier=new_msg.tier,
         )
         chat.messages[i] = updated_message
 
@@ -50,13 +53,12 @@ async def save_expired_chat(message: dict, session_factory: async_sessionmaker[A
     """Save new messages from expired Redis chat data to the database."""
     try:
         key = message['data'].split('=')[1]
-        chat_data_json = await redis.get(key)
-        if not chat_data_json:
+        user_id, chat_id = key.split('/chat:')
+        chat = await chats_utils.chat_load_redis(redis=AsyncRedis(redis), user_id=int(user_id), chat_id=int(chat_id))
+        if not chat:
             print(f'No chat data found in Redis for key: {key}')
             return
 
-        chat = ChatDataclass.from_dict(loads(chat_data_json))
-
         async with session_factory() as session:
             await save_messages(chat=chat, db=session)
             await gpt_service.chat_edit(
@@ -0,0 +1,106 @@
+import asyncio
+from contextlib import suppress
+from dataclasses import asdict
+from json import dumps, loads
+from math import ceil
+from time import time
+from typing import Optional
+
+import src.utils.metrics_utils as metrics_utils
+from src.config import settings
+from src.dto.chats_dto import NNWorkerDataclass
+from src.engines.inference_engine import get_inference_scheduler
+from src.engines.ollama_engine import get_ollama_pool
+from src.engines.redis_engine import AsyncRedis
+
+WORKERS_KEY = 'workers'
+
+
+async def worker_status_publish_loop(redis: AsyncRedis, worker_id: str) -> None:
+    """Publish the readiness and slots occupancy of the worker while it runs.
+
+    Every heartbeat also prunes workers which stopped and refreshes the cached median service time.
+    """
+    try:
+        while True:
+            status = NNWorkerDataclass(
+                worker_id=worker_id,
+                is_ready=get_ollama_pool().is_ready,
+                updated_at=time(),
+                scheduler=get_inference_scheduler().occupancy(),
+            )
+            await redis.hset(WORKERS_KEY, mapping={worker_id: dumps(asdict(status))})
+            await workers_prune(redis=redis)
+            await metrics_utils.metrics_service_time_refresh(redis=redis)
+            await asyncio.sleep(settings.worker_heartbeat_interval)
+    finally:
+        with suppress(Exception):
+            await redis.hdel(WORKERS_KEY, worker_id)
+
+
+async def workers_get(redis: AsyncRedis) -> list[NNWorkerDataclass]:
+    """Get the statuses of the running inference workers, skipping workers which stopped reporting."""
+    expired_at = time() - settings.worker_heartbeat_interval * 3
+    workers = []
+    for _, redis_worker in sorted((await redis.hgetall(WORKERS_KEY)).items()):
+        worker: NNWorkerDataclass = NNWorkerDataclass.from_dict(loads(redis_worker))
+        if worker.updated_at >= expired_at:
+            workers.append(worker)
+
+    return workers
+
+
+async def workers_prune(redis: AsyncRedis) -> None:
+    """Delete the statuses of workers which stopped reporting."""
+    expired_at = time() - settings.worker_heartbeat_interval * 3
+    for worker_id, redis_worker in (await redis.hgetall(WORKERS_KEY)).items():
+        if NNWorkerDataclass.from_dict(loads(redis_worker)).updated_at < expired_at:
+            await redis.hdel(WORKERS_KEY, worker_id)
+
+
+async def workers_capacity_get(redis: AsyncRedis) -> tuple[int, float]:
+    """Get the total concurrency of the running workers and the service time per turn.
+
+    The service time is the median of the recorded turns, falling back to the mean moving average
+    of the workers while no turn was recorded in the histogram window.
+    """
+    workers = await workers_get(redis=redis)
+    concurrency = sum(worker.scheduler.concurrency for worker in workers)
+    if not concurrency:
+        return 0, 0.0
+
+    service_time = await metrics_utils.metrics_service_time_get(redis=redis)
+    if service_time is None:
+        service_time = (
+            sum(worker.scheduler.service_time * worker.scheduler.concurrency for worker in workers) / concurrency
+        )
+    return concurrency, service_time
+
+
+def workers_eta_calculate(queue_position: int, concurrency: int, service_time: float) -> Optional[float]:
+    """Calculate in seconds when the turn at the queue position finishes on workers of the given capacity.
+
+    Turns are served in rounds of the total worker concurrency, each round taking the service time.
+    """
+    if queue_position <= 0 or not concurrency:
+        return None
+
+    return round(ceil(queue_position / concurrency) * service_time, 1)
+
+
+async def workers_eta_estimate(redis: AsyncRedis, queue_position: int) -> Optional[float]:
+    """Estimate in seconds when the turn at the queue position finishes on the running workers."""
+    if queue_position <= 0:
+        return None
+
+    concurrency, service_time = await workers_capacity_get(redis=redis)
+    return workers_eta_calculate(queue_position=queue_position, concurrency=concurrency, service_time=service_time)
+
+
+async def workers_wait_estimate(redis: AsyncRedis, queue_length: int) -> Optional[float]:
+    """Estimate in seconds how long a new turn would wait for a worker slot behind the queued turns."""
+    concurrency, service_time = await workers_capacity_get(redis=redis)
+    if not concurrency:
+        return None
+
+    return max(0, queue_length - concurrency + 1) * service_time / concurrency
@@ -0,0 +1,60 @@
+"""Inference worker running the queued chat turns.
+
+Run with ``python -m src.worker``. API processes only queue chat turns in Redis, so the HTTP tier and
+the inference consumers scale independently, and turns of a stopped worker are claimed again by another one.
+"""
+
+import asyncio
+import contextlib
+from os import getpid
+from signal import SIGTERM
+from socket import gethostname
+
+import src.controllers.chats_controllers as chats_controllers
+import src.utils.chats_utils as chats_utils
+import src.utils.greetings_utils as greetings_utils
+import src.utils.workers_utils as workers_utils
+from src.engines.inference_engine import init_inference
+from src.engines.ollama_engine import close_ollama, init_ollama, ollama_health_check_loop, ollama_warmup_loop
+from src.engines.openai_engine import close_openai, init_openai
+from src.engines.redis_engine import AsyncRedis, close_redis, init_redis
+
+
+async def worker_run() -> None:
+    """Worker startup, consuming the chat queue until stopped, and shutdown."""
+    current_task = asyncio.current_task()
+    assert current_task is not None
+    asyncio.get_running_loop().add_signal_handler(SIGTERM, current_task.cancel)
+
+    redis_client = await init_redis()
+    await init_ollama()
+    await init_openai()
+    init_inference()
+    redis = AsyncRedis(redis_client)
+    worker_id = f'{gethostname()}:{getpid()}'
+    background_tasks = [
+        asyncio.create_task(ollama_health_check_loop()),
+        asyncio.create_task(ollama_warmup_loop()),
+        asyncio.create_task(chats_utils.chat_job_cancel_listen(redis=redis)),
+        asyncio.create_task(chats_controllers.chat_queue_consume_loop(redis=redis)),
+        asyncio.create_task(greetings_utils.greeting_pool_fill_loop(redis=redis)),
+        asyncio.create_task(workers_utils.worker_status_publish_loop(redis=redis, worker_id=worker_id)),
+    ]
+
+    try:
+        await asyncio.gather(*background_tasks)
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        for task in background_tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+        await close_openai()
+        await close_ollama()
+        await close_redis()
+
+
+if __name__ == '__main__':
+    with contextlib.suppress(asyncio.CancelledError, KeyboardInterrupt):
+        asyncio.run(worker_run())
@@ -1,5 +1,6 @@
 import type { AxiosResponse } from 'axios';
 
+import baseURL from './config';
 import { instance } from './instances';
 import type { SystemRole } from 'types/AuthTypes';
 import type { IChat, TChats, ICreateChat } from 'types/ChatsTypes';
@@ -56,6 +57,9 @@ export const chatsAPI = {
   async getChat(chatId: number): Promise<AxiosResponse<IChat>> {
     return instance.get<IChat>(`/chats/${chatId}`);
   },
+  subscribeChat(chatId: number): EventSource {
+    return new EventSource(`${baseURL}/chats/${chatId}/events`, { withCredentials: true });
+  },
 };
 
 export const usersAPI = {
@@ -1,9 +1,10 @@
-import { useState, useEffect, useRef, type FormEvent } from 'react';
+import { useState, useEffect, type FormEvent } from 'react';
 import type { IChat } from 'types/ChatsTypes';
 import styles from './Chat.module.scss';
 import { chatsAPI } from 'api/api';
 import { useAppDispatch } from 'hooks/redux';
-import { sendMessage } from 'store/reducers/chats/ActionCreators';
+import { refreshChat, sendMessage } from 'store/reducers/chats/ActionCreators';
+import { chatsSlice } from 'store/reducers/chats/Slice';
 import { Message } from '../Message/Message';
 
 interface Props {
@@ -14,51 +15,29 @@ interface Props {
 export const Chat = ({ chat, backToChats }: Props) => {
   const dispatch = useAppDispatch();
   const [message, setMessage] = useState('');
-  const [isFetching, setIsFetching] = useState(chat.queue_position > 0);
-  const intervalRef = useRef<NodeJS.Timeout | null>(null);
-
-  const checkChatStatus = async () => {
-    try {
-      const response = await chatsAPI.getChat(chat.id);
-      const updatedChat = response.data;
-
-      setIsFetching(updatedChat.queue_position > 0);
-
-      if (updatedChat.queue_position === 0 && intervalRef.current) {
-        clearInterval(intervalRef.current);
-        intervalRef.current = null;
-      }
-    } catch (error) {
-      console.error('Failed to check chat status:', error);
-    }
-  };
+  const isFetching = chat.queue_position > 0;
 
   useEffect(() => {
-    if (chat.queue_position > 0 && !intervalRef.current) {
-      intervalRef.current = setInterval(checkChatStatus, 5000);
-    }
+    const events = chatsAPI.subscribeChat(chat.id);
 
-    return () => {
-      if (intervalRef.current) {
-        clearInterval(intervalRef.current);
-        intervalRef.current = null;
+    events.addEventListener('queue', (event) => {
+      const { queue_position, eta } = JSON.parse(event.data);
+      dispatch(chatsSlice.actions.setQueuePosition({ chatId: chat.id, queuePosition: queue_position, eta }));
+    });
+    events.addEventListener('done', () => dispatch(refreshChat(chat.id)));
+    events.addEventListener('error', (event) => {
+      if (event instanceof MessageEvent) {
+        dispatch(refreshChat(chat.id));
       }
-    };
-  }, [chat.id, chat.queue_position]);
+    });
+
+    return () => events.close();
+  }, [chat.id, dispatch]);
 
   const handlerSendMessage = (e: FormEvent<HTMLFormElement>) => {
     e.preventDefault();
     dispatch(sendMessage(message));
     setMessage('');
-
-    if (!isFetching) {
-      setIsFetching(true);
-      setTimeout(() => {
-        if (!intervalRef.current) {
-          intervalRef.current = setInterval(checkChatStatus, 5000);
-        }
-      }, 2000);
-    }
   };
 
   return (
@@ -69,7 +48,12 @@ export const Chat = ({ chat, backToChats }: Props) => {
         </button>
         <span className={styles.top_title}>{chat.title}</span>
       </div>
-      {isFetching && <span className={styles.content_queue}>Место в очереди: {chat.queue_position}</span>}
+      {isFetching && (
+        <span className={styles.content_queue}>
+          Место в очереди: {chat.queue_position}
+          {chat.eta ? `, ожидание ~${Math.ceil(chat.eta / 60)} мин` : ''}
+        </span>
+      )}
       <div className={styles.content}>
         <div className={`${styles.content__messages} ${isFetching ? 'blur' : ''}`}>
           {chat.messages.map((message) => (
@@ -35,6 +35,12 @@ export const chatsSlice = createSlice({
     setChat(state, action: PayloadAction<IChat | undefined>) {
       state.selectedChat = action.payload;
     },
+    setQueuePosition(state, action: PayloadAction<{ chatId: number; queuePosition: number; eta: number | null }>) {
+      if (state.selectedChat?.id === action.payload.chatId) {
+        state.selectedChat.queue_position = action.payload.queuePosition;
+        state.selectedChat.eta = action.payload.eta;
+      }
+    },
   },
 });
 
@@ -18,6 +18,7 @@ export interface IChat {
   messages: Message[];
   events: Event[];
   queue_position: number;
+  eta?: number | null;
   created_at: string;
   updated_at: string;
 }